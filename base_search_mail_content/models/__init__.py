@@ -4,5 +4,6 @@
 #   (<http://www.serpentcs.com>)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
+from . import mail_message
 from . import mail_thread
 from . import trgm_index
@@ -0,0 +1,68 @@
+# Copyright 2016-17 ForgeFlow S.L.
+#   (http://www.forgeflow.com)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
+
+import logging
+
+from odoo import api, models
+from odoo.osv import expression
+
+_logger = logging.getLogger(__name__)
+
+MESSAGE_CONTENT_FIELDS = ["record_name", "subject", "body", "email_from", "reply_to"]
+# Searched fields concatenated in a single expression, so the whole search is
+# served by one trigram index. The index expression must match this one.
+MESSAGE_CONTENT_EXPRESSION = "({})".format(
+    " || E'\\n' || ".join(
+        "COALESCE({}, '')".format(field) for field in MESSAGE_CONTENT_FIELDS
+    )
+)
+# Domain operators searched through the concatenated expression
+MESSAGE_CONTENT_OPERATORS = {
+    "like": "LIKE",
+    "ilike": "ILIKE",
+    "not like": "LIKE",
+    "not ilike": "ILIKE",
+}
+
+
+class MailMessage(models.Model):
+    _inherit = "mail.message"
+
+    def init(self):
+        """Trigram index over the concatenated searched fields. PostgreSQL
+        keeps it up to date when messages are created or written."""
+        res = super().init()
+        self.env.cr.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        if not self.env.cr.fetchone():
+            _logger.warning(
+                "The pg_trgm extension is not installed: the message content "
+                "index is not created."
+            )
+            return res
+        self.env.cr.execute(
+            """
+            CREATE INDEX IF NOT EXISTS mail_message_content_trgm_index
+            ON mail_message USING gin ({} gin_trgm_ops)
+            """.format(
+                MESSAGE_CONTENT_EXPRESSION
+            )
+        )
+        return res
+
+    @api.model
+    def _message_content_query(self, model, operator, value):
+        """SQL query (and its params) returning the ids of the records of the
+        given model with messages whose content matches the value"""
+        self.flush(MESSAGE_CONTENT_FIELDS + ["model", "res_id"])
+        negative = operator in expression.NEGATIVE_TERM_OPERATORS
+        query = """
+            SELECT DISTINCT res_id FROM mail_message
+            WHERE model = %s AND res_id IS NOT NULL
+                AND {negative} {content} {operator} %s
+        """.format(
+            negative="NOT" if negative else "",
+            content=MESSAGE_CONTENT_EXPRESSION,
+            operator=MESSAGE_CONTENT_OPERATORS[operator],
+        )
+        return query, (model, "%{}%".format(value))
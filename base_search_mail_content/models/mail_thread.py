@@ -9,11 +9,22 @@ from lxml import etree
 from odoo import _, api, fields, models
 from odoo.osv import expression
 
+from .mail_message import MESSAGE_CONTENT_OPERATORS
+
 
 class MailThread(models.AbstractModel):
     _inherit = "mail.thread"
 
     def _search_message_content(self, operator, value):
+        # Portal users go through the mail.message ACLs, that hide them the
+        # internal messages
+        if operator in MESSAGE_CONTENT_OPERATORS and self.env.user.has_group(
+            "base.group_user"
+        ):
+            query = self.env["mail.message"]._message_content_query(
+                self._name, operator, value
+            )
+            return [("id", "inselect", query)]
         model_domain = [("model", "=", self._name)]
         if operator not in expression.NEGATIVE_TERM_OPERATORS:
             model_domain += ["|"] * 4
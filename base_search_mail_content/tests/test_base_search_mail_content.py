@@ -23,3 +23,23 @@ class TestBaseSearchMailContent(TransactionCase):
             res["fields_views"]["search"]["fields"],
             "message_content field was not detected",
         )
+
+    def test_base_search_mail_content_3(self):
+        partner_obj = self.env["res.partner"]
+        partner = partner_obj.create({"name": "Test partner"})
+        other = partner_obj.create({"name": "Other partner"})
+        partner.message_post(body="<p>Content with aaabbbccc</p>")
+        other.message_post(body="<p>Other content</p>", subject="Subject")
+        res = partner_obj.search([("message_content", "ilike", "AAABBBCCC")])
+        self.assertEqual(res, partner)
+        res = partner_obj.search([("message_content", "like", "AAABBBCCC")])
+        self.assertFalse(res)
+        res = partner_obj.search([("message_content", "ilike", "subject")])
+        self.assertEqual(res, other)
+        res = partner_obj.search(
+            [
+                ("id", "in", (partner | other).ids),
+                ("message_content", "not ilike", "aaabbbccc"),
+            ]
+        )
+        self.assertIn(other, res)
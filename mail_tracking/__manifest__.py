@@ -7,7 +7,7 @@
 {
     "name": "Email tracking",
     "summary": "Email tracking system for all mails sent",
-    "version": "14.0.3.2.0",
+    "version": "14.0.3.3.0",
     "category": "Social Network",
     "website": "https://github.com/OCA/social",
     "author": ("Tecnativa, " "Odoo Community Association (OCA)"),
@@ -19,9 +19,11 @@
         "data/tracking_data.xml",
         "security/mail_tracking_email_security.xml",
         "security/ir.model.access.csv",
+        "data/ir_cron.xml",
         "views/assets.xml",
         "views/mail_tracking_email_view.xml",
         "views/mail_tracking_event_view.xml",
+        "views/mail_tracking_email_summary_view.xml",
         "views/mail_message_view.xml",
         "views/res_partner_view.xml",
         "views/res_config_settings.xml",
@@ -2,19 +2,33 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 import base64
+import json
 import logging
+import time
 from contextlib import contextmanager
+from datetime import datetime
 
 import werkzeug
 
 import odoo
-from odoo import SUPERUSER_ID, api, http
+from odoo import SUPERUSER_ID, api, fields, http, tools
 
 from odoo.addons.mail.controllers.main import MailController
 
+from ..models.mail_tracking_email import (
+    TRACKING_IMG_SIGNATURE_LENGTH,
+    tracking_img_signature_check,
+)
+
 _logger = logging.getLogger(__name__)
 
 BLANK = "R0lGODlhAQABAIAAANvf7wAAACH5BAEAAAAALAAAAAABAAEAAAICRAEAOw=="
+BLANK_GIF = base64.b64decode(BLANK)
+
+# Database secrets used to check the signed tracking images, per database, with
+# their expiration time, so a rotated secret is read again
+SIGNING_SECRETS = {}
+SIGNING_SECRET_TTL = 60  # seconds
 
 
 @contextmanager
@@ -30,6 +44,18 @@ def db_env(dbname):
         yield api.Environment(cr, SUPERUSER_ID, {})
 
 
+@contextmanager
+def db_cursor(dbname):
+    """Like ``db_env``, but only yields a cursor to avoid the environment setup"""
+    if not http.db_filter([dbname]):
+        raise werkzeug.exceptions.BadRequest()
+    if dbname == http.request.db:
+        yield http.request.cr
+    else:
+        with odoo.sql_db.db_connect(dbname).cursor() as cr:
+            yield cr
+
+
 class MailTrackingController(MailController):
     def _request_metadata(self):
         """Prepare remote info metadata"""
@@ -79,13 +105,22 @@ class MailTrackingController(MailController):
     def mail_tracking_open(self, db, tracking_email_id, token=False, **kw):
         """Route used to track mail openned (With & Without Token)"""
         metadata = self._request_metadata()
+        if tools.config.get("mail_tracking_open_buffer"):
+            self._mail_tracking_open_buffer(db, tracking_email_id, token, metadata)
+            return self._mail_tracking_blank_response()
         with db_env(db) as env:
             try:
-                tracking_email = (
-                    env["mail.tracking.email"]
-                    .sudo()
-                    .search([("id", "=", tracking_email_id), ("token", "=", token)])
-                )
+                tracking_email_obj = env["mail.tracking.email"].sudo()
+                if tracking_email_obj._tracking_img_signature_check(
+                    tracking_email_id, token
+                ):
+                    tracking_email = tracking_email_obj.browse(
+                        tracking_email_id
+                    ).exists()
+                else:
+                    tracking_email = tracking_email_obj.search(
+                        [("id", "=", tracking_email_id), ("token", "=", token)]
+                    )
                 if not tracking_email:
                     _logger.warning(
                         "MailTracking email '%s' not found", tracking_email_id
@@ -96,11 +131,117 @@ class MailTrackingController(MailController):
                 pass
 
         # Always return GIF blank image
+        return self._mail_tracking_blank_response()
+
+    def _mail_tracking_blank_response(self):
         response = werkzeug.wrappers.Response()
         response.mimetype = "image/gif"
-        response.data = base64.b64decode(BLANK)
+        response.data = BLANK_GIF
         return response
 
+    def _mail_tracking_open_buffer(self, db, tracking_email_id, token, metadata):
+        """Validate the tracking email and buffer the open event with a single
+        query. ``mail.tracking.event.buffer`` records are flushed by a cron."""
+        if not tracking_email_id:
+            return
+        # Dated as done by mail.tracking.event._process_data, when the buffer
+        # is flushed it would be too late
+        ts = time.time()
+        dt = datetime.utcfromtimestamp(ts)
+        metadata.update(
+            {
+                "timestamp": ts,
+                "time": fields.Datetime.to_string(dt),
+                "date": fields.Date.to_string(dt),
+            }
+        )
+        with db_cursor(db) as cr:
+            try:
+                signed = self._mail_tracking_signature_check(
+                    cr, tracking_email_id, token
+                )
+                cr.execute(
+                    """
+                    INSERT INTO mail_tracking_event_buffer
+                        (tracking_email_id, event_type, metadata)
+                    SELECT id, 'open', %s
+                    FROM mail_tracking_email
+                    WHERE id = %s
+                        AND (%s OR token IS NOT DISTINCT FROM %s)
+                        AND state IN ('sent', 'delivered')
+                    """,
+                    (
+                        json.dumps(metadata, default=str),
+                        tracking_email_id,
+                        signed,
+                        token or None,
+                    ),
+                )
+            except Exception:
+                _logger.warning(
+                    "MailTracking open event for '%s' not buffered", tracking_email_id
+                )
+
+    def _mail_tracking_signature_check(self, cr, tracking_email_id, signature):
+        """Check a signed tracking image URL without an environment. The
+        database secret is read at most once per ``SIGNING_SECRET_TTL``."""
+        if not signature or len(signature) != TRACKING_IMG_SIGNATURE_LENGTH:
+            return False
+        secret, expiration = SIGNING_SECRETS.get(cr.dbname, (None, 0))
+        if expiration < time.time():
+            cr.execute(
+                "SELECT value FROM ir_config_parameter WHERE key = 'database.secret'"
+            )
+            row = cr.fetchone()
+            secret = row[0] if row else ""
+            SIGNING_SECRETS[cr.dbname] = (secret, time.time() + SIGNING_SECRET_TTL)
+        return tracking_img_signature_check(secret, tracking_email_id, signature)
+
+    @http.route(
+        "/mail/tracking/export/<string:fmt>", type="http", auth="user", methods=["GET"]
+    )
+    def mail_tracking_export(self, fmt, since=None, **kw):
+        """Stream the tracking emails and their events as CSV or NDJSON.
+
+        Pass the ``X-Mail-Tracking-Watermark`` header of the response as the
+        ``since`` parameter of the next request to only export the changes.
+        """
+        if fmt not in ("csv", "ndjson"):
+            raise werkzeug.exceptions.NotFound()
+        if not http.request.env.user.has_group("base.group_system"):
+            raise werkzeug.exceptions.Forbidden()
+        tracking_email_obj = http.request.env["mail.tracking.email"]
+        if since:
+            # Fail before streaming, errors can't be reported afterwards
+            try:
+                tracking_email_obj._export_watermark_parse(since)
+            except ValueError as e:
+                raise werkzeug.exceptions.BadRequest(str(e))
+        until = tracking_email_obj._export_watermark()
+        dbname = http.request.db
+
+        def stream():
+            # The response is streamed once the request cursor is closed
+            with api.Environment.manage(), odoo.registry(dbname).cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                yield from env["mail.tracking.email"]._export_chunks(
+                    fmt, since=since, until=until
+                )
+
+        mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+        return werkzeug.wrappers.Response(
+            stream(),
+            mimetype=mimetype,
+            direct_passthrough=True,
+            headers=[
+                (
+                    "Content-Disposition",
+                    "attachment; filename=mail_tracking.%s" % fmt,
+                ),
+                ("X-Mail-Tracking-Watermark", until or since or ""),
+            ],
+        )
+
     @http.route()
     def mail_init_messaging(self):
         """Route used to initial values of Discuss app"""
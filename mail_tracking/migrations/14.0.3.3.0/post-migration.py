@@ -0,0 +1,23 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import logging
+
+from openupgradelib import openupgrade
+
+_logger = logging.getLogger(__name__)
+
+
+@openupgrade.migrate()
+def migrate(env, version):
+    """Fill the recipient address statistics with the existing trackings"""
+    env.cr.execute(
+        """
+        SELECT DISTINCT recipient_address FROM mail_tracking_email
+        WHERE recipient_address IS NOT NULL
+        """
+    )
+    addresses = [row[0] for row in env.cr.fetchall()]
+    _logger.info("Computing tracking statistics of %s addresses", len(addresses))
+    address_obj = env["mail.tracking.address"]
+    for i in range(0, len(addresses), 1000):
+        address_obj._refresh_addresses(addresses[i : i + 1000])
@@ -13,3 +13,6 @@ from . import mail_thread
 from . import mail_resend_message
 from . import mail_alias
 from . import ir_config_parameter
+from . import mail_tracking_event_buffer
+from . import mail_tracking_address
+from . import mail_tracking_email_summary
@@ -1,11 +1,12 @@
 # Copyright 2016 Antonio Espinosa - <antonio.espinosa@tecnativa.com>
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
-import re
 import threading
 
 from odoo import api, models, tools
 
+from .mail_tracking_email import TRACKING_IMG_ATTR, TRACKING_IMG_ID_RE
+
 
 class IrMailServer(models.Model):
     _inherit = "ir.mail_server"
@@ -19,10 +20,23 @@ class IrMailServer(models.Model):
 
     def _tracking_email_id_body_get(self, body):
         body = body or ""
-        # https://regex101.com/r/lW4cB1/2
-        match = re.search(r'<img[^>]*data-odoo-tracking-email=["\']([0-9]*)["\']', body)
+        # The tracking image is appended at the end of the body, so it's
+        # looked up backwards instead of scanning the whole body
+        index = body.rfind(TRACKING_IMG_ATTR)
+        if index == -1:
+            return False
+        match = TRACKING_IMG_ID_RE.match(body, index)
         return str(match.group(1)) if match and match.group(1) else False
 
+    def _tracking_email_id_queue_pop(self, message_id):
+        """Take the tracking email of the next email of the given message from
+        the queue filled by ``mail.mail._send_prepare_values``"""
+        queue = self.env.context.get("mail_tracking_email_queue") or {}
+        __, tracking_email_ids = queue.get(message_id, (None, None))
+        if not tracking_email_ids:
+            return False
+        return str(tracking_email_ids.pop(0))
+
     def build_email(
         self,
         email_from,
@@ -41,7 +55,9 @@ class IrMailServer(models.Model):
         body_alternative=None,
         subtype_alternative="plain",
     ):
-        tracking_email_id = self._tracking_email_id_body_get(body)
+        tracking_email_id = self._tracking_email_id_queue_pop(message_id)
+        if not tracking_email_id:
+            tracking_email_id = self._tracking_email_id_body_get(body)
         if tracking_email_id:
             headers = self._tracking_headers_add(tracking_email_id, headers)
         msg = super(IrMailServer, self).build_email(
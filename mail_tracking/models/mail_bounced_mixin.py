@@ -1,7 +1,7 @@
 # Copyright 2018 Tecnativa - Ernesto Tejeda
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
-from odoo import fields, models
+from odoo import api, fields, models
 
 
 class MailBouncedMixin(models.AbstractModel):
@@ -16,6 +16,36 @@ class MailBouncedMixin(models.AbstractModel):
 
     email_bounced = fields.Boolean(index=True)
 
+    def init(self):
+        res = super().init()
+        if not self._abstract and self._auto:
+            # Case insensitive index used by the bounces propagation
+            self.env.cr.execute(
+                'CREATE INDEX IF NOT EXISTS "{table}_{field}_lower_index" '
+                'ON "{table}" (lower("{field}"))'.format(
+                    table=self._table, field=self._primary_email
+                )
+            )
+        return res
+
+    @api.model
+    def _search_primary_emails(self, emails):
+        """Search the records whose email matches, case insensitively, any of
+        the given emails in a single indexed query"""
+        emails = list({email.lower() for email in emails if email})
+        if not emails:
+            return self.browse()
+        self.flush([self._primary_email])
+        self.env.cr.execute(
+            'SELECT id FROM "{table}" WHERE lower("{field}") = ANY(%s)'.format(
+                table=self._table, field=self._primary_email
+            ),
+            (emails,),
+        )
+        ids = [row[0] for row in self.env.cr.fetchall()]
+        # Apply the active filter and the record rules as a regular search
+        return self.search([("id", "in", ids)]) if ids else self.browse()
+
     def email_bounced_set(self, tracking_emails, reason, event=None):
         """Inherit this method to make any other actions to the model that
         inherit the mixin"""
@@ -1,11 +1,16 @@
 # Copyright 2016 Antonio Espinosa - <antonio.espinosa@tecnativa.com>
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+import logging
 import time
 from datetime import datetime
 from email.utils import COMMASPACE
 
-from odoo import fields, models
+import psycopg2
+
+from odoo import fields, models, tools
+
+_logger = logging.getLogger(__name__)
 
 
 class MailMail(models.Model):
@@ -28,10 +33,102 @@ class MailMail(models.Model):
             "sender": self.email_from,
         }
 
+    def _tracking_email_to(self, partner=None):
+        """Recipients of the email sent to the given partner, as computed by
+        ``_send_prepare_values``"""
+        if partner:
+            return [
+                tools.formataddr((partner.name or "False", partner.email or "False"))
+            ]
+        return tools.email_split_and_format(self.email_to)
+
+    def _tracking_emails_create(self):
+        """Create at once the tracking emails of all the recipients of these
+        mails, in the same order than ``_send``. Return their ids indexed by
+        mail and partner ids"""
+        keys, vals_list = [], []
+        for mail in self.filtered(lambda one: one.state == "outgoing"):
+            partners = list(mail.recipient_ids)
+            if mail.email_to:
+                partners.insert(0, None)
+            for partner in partners:
+                email = {"email_to": mail._tracking_email_to(partner)}
+                keys.append((mail.id, partner.id if partner else False))
+                vals_list.append(mail._tracking_email_prepare(partner, email))
+        tracking_emails = self.env["mail.tracking.email"].sudo().create(vals_list)
+        return dict(zip(keys, tracking_emails.ids))
+
+    def _send(self, auto_commit=False, raise_exception=False, smtp_session=None):
+        """Create the tracking emails of the whole batch before sending it,
+        and remove the ones that weren't used by ``_send_prepare_values``"""
+        if "mail_tracking_email_ids" in self.env.context:
+            return super()._send(
+                auto_commit=auto_commit,
+                raise_exception=raise_exception,
+                smtp_session=smtp_session,
+            )
+        tracking_email_ids = self._tracking_emails_create()
+        mails = self.with_context(
+            mail_tracking_email_ids=tracking_email_ids,
+            mail_tracking_email_queue={},
+        )
+        done = False
+        try:
+            res = super(MailMail, mails)._send(
+                auto_commit=auto_commit,
+                raise_exception=raise_exception,
+                smtp_session=smtp_session,
+            )
+            done = True
+        finally:
+            if tracking_email_ids:
+                self._tracking_emails_unused_unlink(
+                    list(tracking_email_ids.values()), auto_commit=auto_commit and done
+                )
+        return res
+
+    def _tracking_emails_unused_unlink(self, tracking_email_ids, auto_commit=False):
+        """Remove the pre-created tracking emails of the emails that weren't
+        prepared, i.e. the ones not sent because ``_send`` failed before"""
+        try:
+            with self.env.cr.savepoint():
+                self.env["mail.tracking.email"].sudo().browse(
+                    tracking_email_ids
+                ).unlink()
+        except psycopg2.Error:
+            # The transaction is already aborted
+            _logger.warning(
+                "Unable to remove %s unused tracking emails", len(tracking_email_ids)
+            )
+            return
+        if auto_commit:
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+
     def _send_prepare_values(self, partner=None):
-        """Creates the mail.tracking.email record and adds the image tracking
-        to the email"""
+        """Creates the mail.tracking.email record, or takes the one created
+        for the whole batch, and adds the image tracking to the email"""
         email = super()._send_prepare_values(partner=partner)
-        vals = self._tracking_email_prepare(partner, email)
-        tracking_email = self.env["mail.tracking.email"].sudo().create(vals)
+        tracking_email_obj = self.env["mail.tracking.email"].sudo()
+        tracking_email_id = self.env.context.get("mail_tracking_email_ids", {}).pop(
+            (self.id, partner.id if partner else False), None
+        )
+        tracking_email = tracking_email_obj.browse(tracking_email_id)
+        if not tracking_email:
+            vals = self._tracking_email_prepare(partner, email)
+            tracking_email = tracking_email_obj.create(vals)
+        else:
+            recipient = COMMASPACE.join(email.get("email_to", []))
+            if tracking_email.recipient != recipient:
+                tracking_email.recipient = recipient
+        # build_email is called for the prepared emails of the mail, in the
+        # same order, so it takes their tracking email from this queue. The
+        # mails of a message share its message id: the entries left by a
+        # previous mail whose sending failed are dropped.
+        queue = self.env.context.get("mail_tracking_email_queue")
+        if queue is not None:
+            mail_id, tracking_email_ids = queue.get(self.message_id, (None, None))
+            if mail_id != self.id:
+                tracking_email_ids = []
+                queue[self.message_id] = (self.id, tracking_email_ids)
+            tracking_email_ids.append(tracking_email.id)
         return tracking_email.tracking_img_add(email)
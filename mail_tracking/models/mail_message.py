@@ -2,12 +2,16 @@
 # Copyright 2019 Alexandre Díaz
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+from collections import defaultdict
 from email.utils import getaddresses
 
-from odoo import _, api, fields, models
-from odoo.osv import expression
+from odoo import _, api, fields, models, tools
+from odoo.osv.query import Query
 from odoo.tools import email_split
 
+# Key of the pending bus notifications in the cursor precommit data
+TRACKING_STATUS_NOTIFICATIONS = "mail_tracking.toggle_tracking_status"
+
 
 class MailMessage(models.Model):
     _inherit = "mail.message"
@@ -58,30 +62,187 @@ class MailMessage(models.Model):
                 needs_action and involves_me and has_failed_trackings
             )
 
-    def _search_is_failed_message(self, operator, value):
-        """Search for messages considered failed for the active user.
-        Be notice that 'notificacion_ids' is a record that change if
-        the user mark the message as readed.
+    def init(self):
+        """Partial index for the failed messages lookup, as only a tiny
+        fraction of the messages need action"""
+        res = super().init()
+        self.env.cr.execute(
+            """
+            CREATE INDEX IF NOT EXISTS mail_message_tracking_needs_action_index
+            ON mail_message (author_id)
+            WHERE mail_tracking_needs_action
+            """
+        )
+        return res
+
+    @api.model
+    def _failed_message_query(self):
+        """SQL query (and its params) returning the ids of the messages
+        considered failed for the active user"""
+        self.flush(["mail_tracking_needs_action", "author_id"])
+        self.env["mail.tracking.email"].flush(["mail_message_id", "state"])
+        self.env["mail.notification"].flush(["mail_message_id", "res_partner_id"])
+        partner_id = self.env.user.partner_id.id
+        query = """
+            SELECT m.id FROM mail_message m
+            WHERE m.mail_tracking_needs_action
+                AND EXISTS (
+                    SELECT 1 FROM mail_tracking_email t
+                    WHERE t.mail_message_id = m.id AND t.state IN %s
+                )
+                AND (
+                    m.author_id = %s
+                    OR EXISTS (
+                        SELECT 1 FROM mail_message_res_partner_needaction_rel n
+                        WHERE n.mail_message_id = m.id AND n.res_partner_id = %s
+                    )
+                )
         """
-        # FIXME: Due to ORM issue with auto_join and 'OR' we construct the domain
-        # using an extra query to get valid results.
-        # For more information see: https://github.com/odoo/odoo/issues/25175
-        notification_partner_ids = self.search(
-            [("notification_ids.res_partner_id", "=", self.env.user.partner_id.id)]
+        return query, (tuple(sorted(self.get_failed_states())), partner_id, partner_id)
+
+    @tools.ormcache()
+    def _thread_model_names(self):
+        """Models whose records can hold messages"""
+        thread = self.env.registry["mail.thread"]
+        return tuple(
+            name
+            for name, model in self.env.registry.items()
+            if not model._abstract and model._auto and issubclass(model, thread)
         )
-        return expression.normalize_domain(
-            [
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        messages = super().create(vals_list)
+        if set(messages.mapped("model")) - {False, *self._message_model_names()}:
+            # The first message of a model, for this worker and, once
+            # committed, for the others
+            self.clear_caches()
+            self.env.cr.postcommit.add(self.clear_caches)
+        return messages
+
+    @tools.ormcache()
+    def _message_model_names(self):
+        """Models having messages, among the ones that can hold them. The
+        distinct models are read by skipping through the index of the message
+        model instead of scanning the whole table. The result is cached until
+        a message of another model is created."""
+        self.flush(["model"])
+        self.env.cr.execute(
+            """
+            WITH RECURSIVE models AS (
                 (
-                    "mail_tracking_ids.state",
-                    "in" if value else "not in",
-                    list(self.get_failed_states()),
-                ),
-                ("mail_tracking_needs_action", "=", True),
-                "|",
-                ("author_id", "=", self.env.user.partner_id.id),
-                ("id", "in", notification_partner_ids.ids),
+                    SELECT model FROM mail_message
+                    WHERE model IS NOT NULL
+                    ORDER BY model LIMIT 1
+                )
+                UNION ALL
+                SELECT (
+                    SELECT m.model FROM mail_message m
+                    WHERE m.model > models.model
+                    ORDER BY m.model LIMIT 1
+                )
+                FROM models WHERE models.model IS NOT NULL
+            )
+            SELECT model FROM models WHERE model IS NOT NULL
+            """
+        )
+        model_names = {row[0] for row in self.env.cr.fetchall()}
+        return tuple(name for name in self._thread_model_names() if name in model_names)
+
+    @api.model
+    def _readable_message_query(self):
+        """SQL query (and its params) returning the ids of the messages
+        readable by the active user, as filtered by ``_search``: the messages
+        authored by or addressed to the user, the ones of their channels and
+        the ones of the documents they can read. Only the access rules of the
+        models having messages are evaluated."""
+        self.flush(
+            [
+                "author_id",
+                "model",
+                "res_id",
+                "message_type",
+                "is_internal",
+                "subtype_id",
+                "partner_ids",
+                "channel_ids",
             ]
         )
+        self.env["mail.notification"].flush(["mail_message_id", "res_partner_id"])
+        self.env["mail.channel.partner"].flush(["channel_id", "partner_id"])
+        partner_id = self.env.user.partner_id.id
+        doc_clauses, doc_params, unrestricted = [], [], []
+        for model_name in self._message_model_names():
+            model = self.env[model_name].with_context(active_test=False)
+            if not model.check_access_rights("read", raise_exception=False):
+                continue
+            if not self.env["ir.rule"]._compute_domain(model_name, "read"):
+                unrestricted.append(model_name)
+                continue
+            res_ids = model._search([])
+            if isinstance(res_ids, Query):
+                subquery, subparams = res_ids.subselect()
+                doc_clauses.append(
+                    "(m.model = %s AND m.res_id IN ({}))".format(subquery)
+                )
+                doc_params += [model_name, *subparams]
+            elif res_ids:
+                # Some models filter their search results in python
+                doc_clauses.append("(m.model = %s AND m.res_id = ANY(%s))")
+                doc_params += [model_name, list(res_ids)]
+        if unrestricted:
+            doc_clauses.append("m.model IN %s")
+            doc_params.append(tuple(unrestricted))
+        share_clause = ""
+        if not self.env.user.has_group("base.group_user"):
+            share_clause = """
+                NOT COALESCE(m.is_internal, FALSE)
+                AND EXISTS (
+                    SELECT 1 FROM mail_message_subtype s
+                    WHERE s.id = m.subtype_id AND NOT COALESCE(s.internal, FALSE)
+                ) AND
+            """
+        query = """
+            SELECT m.id FROM mail_message m
+            WHERE {share} (
+                m.author_id = %s
+                OR EXISTS (
+                    SELECT 1 FROM mail_message_res_partner_rel r
+                    WHERE r.mail_message_id = m.id AND r.res_partner_id = %s
+                )
+                OR EXISTS (
+                    SELECT 1 FROM mail_message_res_partner_needaction_rel n
+                    WHERE n.mail_message_id = m.id AND n.res_partner_id = %s
+                )
+                OR EXISTS (
+                    SELECT 1 FROM mail_message_mail_channel_rel c
+                    JOIN mail_channel_partner cp ON cp.channel_id = c.mail_channel_id
+                    WHERE c.mail_message_id = m.id AND cp.partner_id = %s
+                )
+                OR (
+                    m.message_type != 'user_notification'
+                    AND m.res_id IS NOT NULL
+                    AND ({doc})
+                )
+            )
+        """.format(
+            share=share_clause, doc=" OR ".join(doc_clauses) or "FALSE"
+        )
+        return query, [partner_id] * 4 + doc_params
+
+    def _search_is_failed_message(self, operator, value):
+        """Search for messages considered failed for the active user.
+        Be notice that 'notificacion_ids' is a record that change if
+        the user mark the message as readed.
+        """
+        positive = (operator == "=") == bool(value)
+        return [
+            (
+                "id",
+                "inselect" if positive else "not inselect",
+                self._failed_message_query(),
+            )
+        ]
 
     def _tracking_status_map_get(self):
         """Map tracking states to be used in chatter"""
@@ -129,22 +290,42 @@ class MailMessage(models.Model):
     def tracking_status(self):
         """Generates a complete status tracking of the messages by partner"""
         res = {}
+        ResPartnerObj = self.env["res.partner"]
+        # Prefetch the trackings and the recipient partners of all the messages
+        trackings_by_message = defaultdict(
+            lambda: self.env["mail.tracking.email"].sudo()
+        )
+        for tracking in (
+            self.env["mail.tracking.email"]
+            .sudo()
+            .search([("mail_message_id", "in", self.ids)])
+        ):
+            trackings_by_message[tracking.mail_message_id.id] |= tracking
+        emails_by_message = {}
         for message in self:
-            partner_trackings = []
-            partners_already = self.env["res.partner"]
-            partners = self.env["res.partner"]
-            trackings = (
-                self.env["mail.tracking.email"]
-                .sudo()
-                .search([("mail_message_id", "=", message.id)])
-            )
             # String to List
-            email_cc_list = self._drop_aliases(email_split(message.email_cc))
-            email_to_list = self._drop_aliases(email_split(message.email_to))
-            # Search related partners recipients
-            partners |= partners.search(
-                [("email", "in", email_cc_list + email_to_list)]
+            emails_by_message[message.id] = (
+                self._drop_aliases(email_split(message.email_cc)),
+                self._drop_aliases(email_split(message.email_to)),
             )
+        all_emails = {
+            email
+            for email_cc_list, email_to_list in emails_by_message.values()
+            for email in email_cc_list + email_to_list
+        }
+        partners_by_email = defaultdict(lambda: ResPartnerObj)
+        if all_emails:
+            for partner in ResPartnerObj.search([("email", "in", list(all_emails))]):
+                partners_by_email[partner.email] |= partner
+        for message in self:
+            partner_trackings = []
+            partners_already = ResPartnerObj
+            partners = ResPartnerObj
+            trackings = trackings_by_message[message.id]
+            email_cc_list, email_to_list = emails_by_message[message.id]
+            # Related partners recipients
+            for email in email_cc_list + email_to_list:
+                partners |= partners_by_email[email]
             # Operate over set's instead of lists
             email_cc_list = set(email_cc_list)
             email_to_list = set(email_to_list) - email_cc_list
@@ -280,19 +461,84 @@ class MailMessage(models.Model):
         """
         self.check_access_rule("read")
         self.write({"mail_tracking_needs_action": False})
-        notification = {
-            "type": "toggle_tracking_status",
-            "message_ids": self.ids,
-            "needs_actions": False,
-        }
-        self.env["bus.bus"].sendone(
-            (self._cr.dbname, "res.partner", self.env.user.partner_id.id), notification
-        )
+        self._notify_tracking_status(False)
+
+    def _notify_tracking_status(self, needs_actions, partners=None):
+        """Queue the ``toggle_tracking_status`` bus notification of these
+        messages for the given partners (the active user one by default).
+
+        The notifications of the transaction are coalesced and sent before the
+        commit, with a single payload per partner and status. A message whose
+        status is toggled back in the same transaction isn't notified."""
+        if not self:
+            return
+        if partners is None:
+            partners = self.env.user.partner_id
+        data = self.env.cr.precommit.data
+        pending = data.get(TRACKING_STATUS_NOTIFICATIONS)
+        if pending is None:
+            pending = data[TRACKING_STATUS_NOTIFICATIONS] = {}
+            self.env.cr.precommit.add(self._send_tracking_status_notifications)
+        for partner_id in partners.ids:
+            statuses = pending.setdefault(partner_id, {})
+            for message_id in self.ids:
+                # Keep the first notified status and the last one
+                first = statuses.get(message_id, (needs_actions,))[0]
+                statuses[message_id] = (first, needs_actions)
+
+    @api.model
+    def _send_tracking_status_notifications(self):
+        """Send the coalesced ``toggle_tracking_status`` notifications"""
+        pending = self.env.cr.precommit.data.pop(TRACKING_STATUS_NOTIFICATIONS, {})
+        notifications = []
+        for partner_id, statuses in pending.items():
+            message_ids = {True: [], False: []}
+            for message_id, (first, last) in statuses.items():
+                if first == last:
+                    message_ids[last].append(message_id)
+            for needs_actions, ids in message_ids.items():
+                if not ids:
+                    continue
+                notifications.append(
+                    (
+                        (self._cr.dbname, "res.partner", partner_id),
+                        {
+                            "type": "toggle_tracking_status",
+                            "message_ids": ids,
+                            "needs_actions": needs_actions,
+                        },
+                    )
+                )
+        if notifications:
+            self.env["bus.bus"].sendmany(notifications)
+
+    def _tracking_needs_action_set(self):
+        """Flag these messages as failed, notifying the involved users of the
+        ones that weren't"""
+        messages = self.filtered(lambda one: not one.mail_tracking_needs_action)
+        self.write({"mail_tracking_needs_action": True})
+        messages._notify_tracking_failed()
+
+    def _notify_tracking_failed(self):
+        """Notify the users involved in these messages that they failed"""
+        messages_by_partner = defaultdict(lambda: self.browse())
+        for message in self:
+            partners = message.author_id | message.notification_ids.mapped(
+                "res_partner_id"
+            )
+            for partner in partners.filtered("user_ids"):
+                messages_by_partner[partner] |= message
+        for partner, messages in messages_by_partner.items():
+            messages._notify_tracking_status(True, partner)
 
     @api.model
     def get_failed_count(self):
         """Gets the number of failed messages used on discuss mailbox item"""
-        return self.search_count([("is_failed_message", "=", True)])
+        # The failed messages are readable by the user, as they are
+        # their author or one of their notified partners
+        query, params = self._failed_message_query()
+        self.env.cr.execute("SELECT COUNT(*) FROM (%s) failed" % query, params)
+        return self.env.cr.fetchone()[0]
 
     @api.model
     def set_all_as_reviewed(self):
@@ -300,20 +546,11 @@ class MailMessage(models.Model):
 
         Used by Discuss"""
 
-        unreviewed_messages = self.search([("is_failed_message", "=", True)])
+        self.env.cr.execute(*self._failed_message_query())
+        unreviewed_messages = self.browse([row[0] for row in self.env.cr.fetchall()])
         unreviewed_messages.write({"mail_tracking_needs_action": False})
-        ids = unreviewed_messages.ids
-
-        self.env["bus.bus"].sendone(
-            (self._cr.dbname, "res.partner", self.env.user.partner_id.id),
-            {
-                "type": "toggle_tracking_status",
-                "message_ids": ids,
-                "needs_actions": False,
-            },
-        )
-
-        return ids
+        unreviewed_messages._notify_tracking_status(False)
+        return unreviewed_messages.ids
 
     @api.model
     def get_failed_messsage_info(self, ids, model):
@@ -49,13 +49,5 @@ class MailResendMessage(models.TransientModel):
                 tracking_ids.sudo().write({"state": False})
                 # Send bus notifications to update Discuss and
                 # mail_failed_messages widget
-                notification = {
-                    "type": "toggle_tracking_status",
-                    "message_ids": [self.mail_message_id.id],
-                    "needs_actions": False,
-                }
-                self.env["bus.bus"].sendone(
-                    (self._cr.dbname, "res.partner", self.env.user.partner_id.id),
-                    notification,
-                )
+                wizard.mail_message_id._notify_tracking_status(False)
         super().resend_mail_action()
@@ -0,0 +1,194 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from collections import defaultdict
+
+from odoo import api, fields, models
+
+# mail.tracking.email state: count field
+STATE_COUNT_FIELDS = {
+    "error": "error_count",
+    "deferred": "deferred_count",
+    "sent": "sent_count",
+    "delivered": "delivered_count",
+    "opened": "opened_count",
+    "rejected": "rejected_count",
+    "spam": "spam_count",
+    "unsub": "unsub_count",
+    "bounced": "bounced_count",
+    "soft-bounced": "soft_bounced_count",
+}
+# Key of the addresses to refresh in the cursor precommit data
+REFRESH_ADDRESSES_KEY = "mail_tracking.address_refresh"
+
+
+class MailTrackingAddress(models.Model):
+    """Tracking statistics per recipient address.
+
+    This table is kept up to date when tracking emails are created, written or
+    deleted, so the email score and bounce status of an address don't need to
+    aggregate the whole ``mail_tracking_email`` table. The addresses changed
+    in a transaction are refreshed together once, when the statistics are
+    flushed before being read, or before the commit.
+    """
+
+    _name = "mail.tracking.address"
+    _description = "MailTracking recipient address statistics"
+    _rec_name = "recipient_address"
+    _log_access = False
+
+    _sql_constraints = [
+        (
+            "recipient_address_unique",
+            "UNIQUE(recipient_address)",
+            "Recipient addresses must be unique!",
+        )
+    ]
+
+    recipient_address = fields.Char(required=True, readonly=True)
+    total_count = fields.Integer(readonly=True)
+    error_count = fields.Integer(readonly=True)
+    deferred_count = fields.Integer(readonly=True)
+    sent_count = fields.Integer(readonly=True)
+    delivered_count = fields.Integer(readonly=True)
+    opened_count = fields.Integer(readonly=True)
+    rejected_count = fields.Integer(readonly=True)
+    spam_count = fields.Integer(readonly=True)
+    unsub_count = fields.Integer(readonly=True)
+    bounced_count = fields.Integer(readonly=True)
+    soft_bounced_count = fields.Integer(readonly=True)
+    last_state = fields.Char(readonly=True)
+    last_time = fields.Datetime(readonly=True)
+    score = fields.Float(readonly=True, default=50.0)
+
+    def _state_counts(self):
+        """Mapped states dictionary as expected by
+        ``mail.tracking.email.email_score``"""
+        self.ensure_one()
+        return {
+            state: self[field]
+            for state, field in STATE_COUNT_FIELDS.items()
+            if self[field]
+        }
+
+    def flush(self, fnames=None, records=None):
+        # Refresh the queued addresses before the statistics are read
+        self._refresh_addresses_queued()
+        return super().flush(fnames=fnames, records=records)
+
+    @api.model
+    def _refresh_addresses_queue(self, addresses):
+        """Queue the given recipient addresses to be refreshed once"""
+        addresses = {address for address in addresses if address}
+        if not addresses:
+            return
+        data = self.env.cr.precommit.data
+        queued = data.get(REFRESH_ADDRESSES_KEY)
+        if queued is None:
+            queued = data[REFRESH_ADDRESSES_KEY] = set()
+            self.env.cr.precommit.add(self._refresh_addresses_precommit)
+        queued.update(addresses)
+        # Read the statistics again once refreshed
+        self.invalidate_cache()
+
+    @api.model
+    def _refresh_addresses_queued(self):
+        addresses = self.env.cr.precommit.data.pop(REFRESH_ADDRESSES_KEY, None)
+        if addresses:
+            self.sudo()._refresh_addresses(addresses)
+
+    @api.model
+    def _refresh_addresses_precommit(self):
+        self._refresh_addresses_queued()
+        self.flush()
+
+    @api.model
+    def _refresh_addresses(self, addresses):
+        """Recompute the statistics of the given recipient addresses"""
+        addresses = tuple({address for address in addresses if address})
+        if not addresses:
+            return self.browse()
+        self.env["mail.tracking.email"].flush(["recipient_address", "state", "time"])
+        self.flush()
+        self.env.cr.execute(
+            """
+            DELETE FROM mail_tracking_address a
+            WHERE a.recipient_address IN %s
+                AND NOT EXISTS (
+                    SELECT 1 FROM mail_tracking_email e
+                    WHERE e.recipient_address = a.recipient_address
+                )
+            """,
+            (addresses,),
+        )
+        self.env.cr.execute(
+            """
+            INSERT INTO mail_tracking_address (
+                recipient_address, total_count,
+                error_count, deferred_count, sent_count, delivered_count,
+                opened_count, rejected_count, spam_count, unsub_count,
+                bounced_count, soft_bounced_count,
+                last_state, last_time
+            )
+            SELECT
+                recipient_address, COUNT(*),
+                COUNT(*) FILTER (WHERE state = 'error'),
+                COUNT(*) FILTER (WHERE state = 'deferred'),
+                COUNT(*) FILTER (WHERE state = 'sent'),
+                COUNT(*) FILTER (WHERE state = 'delivered'),
+                COUNT(*) FILTER (WHERE state = 'opened'),
+                COUNT(*) FILTER (WHERE state = 'rejected'),
+                COUNT(*) FILTER (WHERE state = 'spam'),
+                COUNT(*) FILTER (WHERE state = 'unsub'),
+                COUNT(*) FILTER (WHERE state = 'bounced'),
+                COUNT(*) FILTER (WHERE state = 'soft-bounced'),
+                (ARRAY_AGG(state ORDER BY time DESC, id DESC))[1],
+                MAX(time)
+            FROM mail_tracking_email
+            WHERE recipient_address IN %s
+            GROUP BY recipient_address
+            ON CONFLICT (recipient_address) DO UPDATE SET
+                total_count = EXCLUDED.total_count,
+                error_count = EXCLUDED.error_count,
+                deferred_count = EXCLUDED.deferred_count,
+                sent_count = EXCLUDED.sent_count,
+                delivered_count = EXCLUDED.delivered_count,
+                opened_count = EXCLUDED.opened_count,
+                rejected_count = EXCLUDED.rejected_count,
+                spam_count = EXCLUDED.spam_count,
+                unsub_count = EXCLUDED.unsub_count,
+                bounced_count = EXCLUDED.bounced_count,
+                soft_bounced_count = EXCLUDED.soft_bounced_count,
+                last_state = EXCLUDED.last_state,
+                last_time = EXCLUDED.last_time
+            RETURNING id
+            """,
+            (addresses,),
+        )
+        records = self.browse([row[0] for row in self.env.cr.fetchall()])
+        self.invalidate_cache()
+        records._update_score()
+        return records
+
+    def _update_score(self):
+        """Store the email score, writing together the addresses that share it"""
+        mte_obj = self.env["mail.tracking.email"].sudo()
+        scores = defaultdict(list)
+        for address in self:
+            score = mte_obj.with_context(
+                mt_states=address._state_counts()
+            ).email_score()
+            scores[score].append(address.id)
+        for score, ids in scores.items():
+            self.browse(ids).write({"score": score})
+
+    @api.model
+    def _get_addresses(self, emails):
+        """Return a dictionary of the statistics of the given emails, indexed
+        by lowercase email"""
+        emails = {email.lower() for email in emails if email}
+        if not emails:
+            return {}
+        return {
+            address.recipient_address: address
+            for address in self.search([("recipient_address", "in", list(emails))])
+        }
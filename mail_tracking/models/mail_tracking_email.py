@@ -1,15 +1,23 @@
 # Copyright 2016 Antonio Espinosa - <antonio.espinosa@tecnativa.com>
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+import csv
+import hashlib
+import hmac
+import io
+import json
 import logging
 import re
+import threading
 import time
 import urllib.parse
 import uuid
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, timedelta
 
 from odoo import _, api, fields, models, tools
 from odoo.exceptions import AccessError
+from odoo.osv import expression
 from odoo.tools import email_split
 
 _logger = logging.getLogger(__name__)
@@ -17,6 +25,40 @@ _logger = logging.getLogger(__name__)
 EVENT_OPEN_DELTA = 10  # seconds
 EVENT_CLICK_DELTA = 5  # seconds
 
+EXPORT_BATCH_SIZE = 2000  # rows fetched from the server side cursor at once
+# write_date is the start time of the writing transaction, so a row committed
+# after the watermark was read may carry an older date: the next incremental
+# export starts this long before the watermark to catch it.
+EXPORT_WATERMARK_OVERLAP = 600  # seconds
+EXPORT_WATERMARK_FORMATS = ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S")
+
+TRACKING_IMG_ATTR = "data-odoo-tracking-email"
+TRACKING_IMG_RE = re.compile(
+    r'<img[^>]*data-odoo-tracking-email=["\'][0-9]*["\'][^>]*>'
+)
+TRACKING_IMG_ID_RE = re.compile(r'data-odoo-tracking-email=["\']([0-9]*)["\']')
+TRACKING_IMG_CLOSING_TAG_RE = re.compile(r"</(body|html)\s*>", re.IGNORECASE)
+
+TRACKING_IMG_SIGNATURE_SCOPE = "mail_tracking.open"
+TRACKING_IMG_SIGNATURE_LENGTH = 64
+
+
+def tracking_img_signature(secret, tracking_email_id):
+    """HMAC signature of the tracking image URL of a tracking email"""
+    message = repr((TRACKING_IMG_SIGNATURE_SCOPE, int(tracking_email_id)))
+    return hmac.new(secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+
+def tracking_img_signature_check(secret, tracking_email_id, signature):
+    """Check the signature of a tracking image URL, without any query"""
+    if not (secret and tracking_email_id and signature):
+        return False
+    if len(signature) != TRACKING_IMG_SIGNATURE_LENGTH:
+        return False
+    return hmac.compare_digest(
+        tracking_img_signature(secret, tracking_email_id), signature
+    )
+
 
 class MailTrackingEmail(models.Model):
     _name = "mail.tracking.email"
@@ -118,6 +160,19 @@ class MailTrackingEmail(models.Model):
         groups="base.group_system",
     )
 
+    def init(self):
+        """Partial index for the failed messages lookup of Discuss"""
+        res = super().init()
+        self.env.cr.execute(
+            """
+            CREATE INDEX IF NOT EXISTS mail_tracking_email_failed_state_index
+            ON mail_tracking_email (mail_message_id)
+            WHERE state IN %s
+            """,
+            (tuple(sorted(self.env["mail.message"].get_failed_states())),),
+        )
+        return res
+
     @api.depends("mail_message_id")
     def _compute_message_id(self):
         """This helper field will allow us to map the message_id from either the linked
@@ -133,48 +188,50 @@ class MailTrackingEmail(models.Model):
         failed_states = self.env["mail.message"].get_failed_states()
         records.filtered(lambda one: one.state in failed_states).mapped(
             "mail_message_id"
-        ).write({"mail_tracking_needs_action": True})
+        )._tracking_needs_action_set()
+        self.env["mail.tracking.address"]._refresh_addresses_queue(
+            records.mapped("recipient_address")
+        )
         return records
 
     def write(self, vals):
+        refresh_addresses = {"state", "recipient", "time"}.intersection(vals)
+        if refresh_addresses:
+            addresses = set(self.mapped("recipient_address"))
         super().write(vals)
         state = vals.get("state")
         if state and state in self.env["mail.message"].get_failed_states():
-            self.mapped("mail_message_id").write({"mail_tracking_needs_action": True})
+            self.mapped("mail_message_id")._tracking_needs_action_set()
+        if refresh_addresses:
+            addresses.update(self.mapped("recipient_address"))
+            self.env["mail.tracking.address"]._refresh_addresses_queue(addresses)
+
+    @api.model
+    def _allowed_tracking_domain(self):
+        """Domain of the trackings readable by the active user: the ones of a
+        readable message, the ones without message of a readable partner and
+        the ones without any of them"""
+        return [
+            "|",
+            (
+                "mail_message_id",
+                "inselect",
+                self.env["mail.message"]._readable_message_query(),
+            ),
+            "&",
+            ("mail_message_id", "=", False),
+            "|",
+            ("partner_id", "=", False),
+            ("partner_id", "in", self.env["res.partner"]._search([])),
+        ]
 
     def _find_allowed_tracking_ids(self):
         """Filter trackings based on related records ACLs"""
         # Admins passby this filter
         if not self or self.env.user.has_group("base.group_system"):
             return self.ids
-        # Override ORM to get the values directly
-        self._cr.execute(
-            """
-            SELECT id, mail_message_id, partner_id
-            FROM mail_tracking_email WHERE id IN %s
-            """,
-            (tuple(self.ids),),
-        )
-        msg_linked = self._cr.fetchall()
-        if not msg_linked:
-            return []
-        _, msg_ids, partner_ids = zip(*msg_linked)
-        # Filter messages with their ACL rules avoiding False values fetched in the set
-        msg_ids = self.env["mail.message"]._search(
-            [("id", "in", [x for x in msg_ids if x])]
-        )
-        partner_ids = self.env["res.partner"]._search(
-            [("id", "in", [x for x in partner_ids if x])]
-        )
-        return [
-            track_id
-            for track_id, mail_msg_id, partner_id in msg_linked
-            if (mail_msg_id in msg_ids)  # We can read the linked message
-            or (
-                not mail_msg_id and partner_id in partner_ids
-            )  # No linked mail.message but we can read the linked partner
-            or (not any({mail_msg_id, partner_id}))  # No linked record
-        ]
+        allowed_ids = set(self._search([("id", "in", self.ids)]))
+        return [track_id for track_id in self.ids if track_id in allowed_ids]
 
     @api.model
     def _search(
@@ -186,19 +243,24 @@ class MailTrackingEmail(models.Model):
         count=False,
         access_rights_uid=None,
     ):
-        """Filter ids based on related records ACLs"""
-        ids = super()._search(
+        """Filter ids based on related records ACLs. The filter is part of the
+        search query, so limit, offset and count are applied to the allowed
+        trackings only"""
+        if not self.env.su and not self.env.user.has_group("base.group_system"):
+            args = expression.AND([list(args), self._allowed_tracking_domain()])
+        return super()._search(
             args, offset, limit, order, count=count, access_rights_uid=access_rights_uid
         )
-        if not self.env.user.has_group("base.group_system") and not count:
-            ids = self.browse(ids)._find_allowed_tracking_ids()
-        return ids
 
     def check_access_rule(self, operation):
         """Rely on related messages ACLs"""
         super().check_access_rule(operation)
-        allowed_ids = self._search([("id", "in", self._find_allowed_tracking_ids())])
-        disallowed_ids = set(self.exists().ids).difference(set(allowed_ids))
+        if self.env.su or self.env.user.has_group("base.group_system"):
+            return
+        disallowed_ids = set(self.ids).difference(self._find_allowed_tracking_ids())
+        if disallowed_ids:
+            # Missing records are reported by the ORM afterwards
+            disallowed_ids = set(self.browse(disallowed_ids).exists().ids)
         if not disallowed_ids:
             return
         raise AccessError(
@@ -225,8 +287,13 @@ class MailTrackingEmail(models.Model):
     def email_is_bounced(self, email):
         if not email:
             return False
-        res = self.sudo()._email_last_tracking_state(email)
-        return res and res[0].get("state", "") in {
+        address = (
+            self.env["mail.tracking.address"]
+            .sudo()
+            ._get_addresses([email])
+            .get(email.lower())
+        )
+        return bool(address) and address.last_state in {
             "rejected",
             "error",
             "spam",
@@ -246,13 +313,20 @@ class MailTrackingEmail(models.Model):
     def email_score_from_email(self, email):
         if not email:
             return 0.0
-        data = self.sudo().read_group(
-            [("recipient_address", "=", email.lower())],
-            ["recipient_address", "state"],
-            ["state"],
-        )
-        mapped_data = {state["state"]: state["state_count"] for state in data}
-        return self.with_context(mt_states=mapped_data).sudo().email_score()
+        return self.email_score_from_emails([email])[email.lower()]
+
+    @api.model
+    def email_score_from_emails(self, emails):
+        """Email scores of several emails, indexed by lowercase email"""
+        addresses = self.env["mail.tracking.address"].sudo()._get_addresses(emails)
+        default = self.browse().sudo().with_context(mt_states={}).email_score()
+        return {
+            email.lower(): addresses[email.lower()].score
+            if email.lower() in addresses
+            else default
+            for email in emails
+            if email
+        }
 
     @api.model
     def _email_score_weights(self):
@@ -312,12 +386,36 @@ class MailTrackingEmail(models.Model):
         for email in self:
             email.date = fields.Date.to_string(fields.Date.from_string(email.time))
 
-    def _get_mail_tracking_img(self):
-        m_config = self.env["ir.config_parameter"]
+    @api.model
+    @tools.ormcache()
+    def _tracking_img_url_params(self):
+        """Base URL of the tracking images, whether they are signed and the
+        signing secret. Cached, as changing a parameter clears the caches."""
+        m_config = self.env["ir.config_parameter"].sudo()
         base_url = m_config.get_param("mail_tracking.base.url") or m_config.get_param(
             "web.base.url"
         )
-        if self.token:
+        signed = bool(m_config.get_param("mail_tracking.signed_urls"))
+        return base_url, signed, m_config.get_param("database.secret")
+
+    @api.model
+    def _tracking_img_signature_check(self, tracking_email_id, signature):
+        """Whether the tracking image URL is signed for the tracking email"""
+        return tracking_img_signature_check(
+            self._tracking_img_url_params()[2], tracking_email_id, signature
+        )
+
+    def _get_mail_tracking_img(self):
+        base_url, signed, secret = self._tracking_img_url_params()
+        if signed:
+            # The signature avoids reading the token of the tracking email
+            path_url = "mail/tracking/open/{db}/{tracking_email_id}/{sign}/blank.gif"
+            path_url = path_url.format(
+                db=self.env.cr.dbname,
+                tracking_email_id=self.id,
+                sign=tracking_img_signature(secret, self.id),
+            )
+        elif self.token:
             path_url = (
                 "mail/tracking/open/%(db)s/%(tracking_email_id)s/%(token)s/"
                 "blank.gif"
@@ -340,15 +438,16 @@ class MailTrackingEmail(models.Model):
         )
 
     def _partners_email_bounced_set(self, reason, event=None):
-        recipients = []
-        if event and event.recipient_address:
-            recipients.append(event.recipient_address)
+        """Set as bounced the partners of the recipients of these tracking
+        emails, or of the given events (a recordset of one or several events)
+        """
+        if event and any(event.mapped("recipient_address")):
+            recipients = event.mapped("recipient_address")
         else:
-            recipients = [x for x in self.mapped("recipient_address") if x]
-        for recipient in recipients:
-            self.env["res.partner"].search(
-                [("email", "=ilike", recipient)]
-            ).email_bounced_set(self, reason, event=event)
+            recipients = self.mapped("recipient_address")
+        self.env["res.partner"]._search_primary_emails(recipients).email_bounced_set(
+            self, reason, event=event
+        )
 
     def smtp_error(self, mail_server, smtp_server, exception):
         values = {"state": "error"}
@@ -374,18 +473,31 @@ class MailTrackingEmail(models.Model):
             self.sudo()._partners_email_bounced_set("error")
         self.sudo().write(values)
 
+    @api.model
+    def _tracking_img_append(self, body, tracking_img):
+        """Append the tracking image to the HTML body, before its last closing
+        body or html tag if any, whatever their case, without reparsing the
+        whole document"""
+        tracking_img = "\n%s\n" % tracking_img
+        closing_tags = {}
+        for match in TRACKING_IMG_CLOSING_TAG_RE.finditer(body):
+            closing_tags[match.group(1).lower()] = match.start()
+        insert_location = closing_tags.get("body", closing_tags.get("html"))
+        if insert_location is None:
+            return body + tracking_img
+        return "{}{}{}".format(
+            body[:insert_location], tracking_img, body[insert_location:]
+        )
+
     def tracking_img_add(self, email):
         self.ensure_one()
         tracking_url = self._get_mail_tracking_img()
         if tracking_url:
-            content = email.get("body", "")
-            content = re.sub(
-                r'<img[^>]*data-odoo-tracking-email=["\'][0-9]*["\'][^>]*>', "", content
-            )
-            body = tools.append_content_to_html(
-                content, tracking_url, plaintext=False, container_tag="div"
-            )
-            email["body"] = body
+            content = email.get("body", "") or ""
+            # Only scan the body for former tracking images if there are any
+            if TRACKING_IMG_ATTR in content:
+                content = TRACKING_IMG_RE.sub("", content)
+            email["body"] = self._tracking_img_append(content, tracking_url)
         return email
 
     def _message_partners_check(self, message, message_id):
@@ -465,6 +577,104 @@ class MailTrackingEmail(models.Model):
                 _logger.debug("Concurrent event '%s' discarded", event_type)
         return event_ids
 
+    @api.model
+    def _concurrent_events_batch(self, events):
+        """Discard open and click events concurrent to already stored events or
+        to previous events of the same batch, fetching the candidates in one
+        query.
+
+        :param events: list of ``(tracking_email_id, event_type, metadata)``
+        :return: the list of events that aren't concurrent
+        """
+        now = time.time()
+        deltas = {"open": EVENT_OPEN_DELTA, "click": EVENT_CLICK_DELTA}
+        checked = [
+            (tracking_id, float(metadata.get("timestamp", now)))
+            for tracking_id, event_type, metadata in events
+            if event_type in deltas
+        ]
+        seen = defaultdict(list)
+        if checked:
+            tracking_ids, timestamps = zip(*checked)
+            delta = max(deltas.values())
+            self.env["mail.tracking.event"].flush(
+                ["tracking_email_id", "event_type", "timestamp", "url"]
+            )
+            self.env.cr.execute(
+                """
+                SELECT tracking_email_id, event_type, timestamp, url
+                FROM mail_tracking_event
+                WHERE tracking_email_id IN %s
+                    AND event_type IN ('open', 'click')
+                    AND timestamp BETWEEN %s AND %s
+                """,
+                (
+                    tuple(set(tracking_ids)),
+                    min(timestamps) - delta,
+                    max(timestamps) + delta,
+                ),
+            )
+            for tracking_id, event_type, ts, url in self.env.cr.fetchall():
+                seen[(tracking_id, event_type)].append((float(ts), url or False))
+        res = []
+        for tracking_id, event_type, metadata in events:
+            if event_type not in deltas:
+                res.append((tracking_id, event_type, metadata))
+                continue
+            ts = float(metadata.get("timestamp", now))
+            url = metadata.get("url", False) if event_type == "click" else False
+            concurrent = any(
+                abs(ts - other_ts) <= deltas[event_type]
+                and (event_type == "open" or other_url == url)
+                for other_ts, other_url in seen[(tracking_id, event_type)]
+            )
+            if concurrent:
+                _logger.debug("Concurrent event '%s' discarded", event_type)
+                continue
+            seen[(tracking_id, event_type)].append((ts, url))
+            res.append((tracking_id, event_type, metadata))
+        return res
+
+    @api.model
+    def event_create_batch(self, events):
+        """Create the tracking events of many tracking emails at once.
+
+        Concurrent open and click events are discarded with a single query.
+        Each event is prepared by its ``mail.tracking.event.process_*`` method,
+        as done by ``event_create``, but in batch mode: the tracking email
+        values are collected and written grouped by their new values by
+        ``mail.tracking.event._process_batch_flush``, and all the events are
+        inserted with one ``create``.
+
+        :param events: iterable of ``(tracking_email_id, event_type, metadata)``
+        :return: the created ``mail.tracking.event`` records
+        """
+        m_event = self.env["mail.tracking.event"].sudo()
+        events = [event for event in events if event[0]]
+        trackings = self.sudo().browse({event[0] for event in events}).exists()
+        events = [event for event in events if event[0] in trackings.ids]
+        if not events:
+            return m_event
+        events = self._concurrent_events_batch(events)
+        batch = {"tracking_vals": defaultdict(dict)}
+        trackings = trackings.with_context(mail_tracking_event_batch=batch)
+        vals_list = []
+        for tracking_id, event_type, metadata in events:
+            vals = trackings.browse(tracking_id)._event_prepare(event_type, metadata)
+            if vals:
+                vals_list.append(vals)
+        m_event.with_context(mail_tracking_event_batch=batch)._process_batch_flush(
+            batch
+        )
+        new_events = m_event.create(vals_list)
+        for event_type in {"hard_bounce", "spam", "reject"}:
+            bounced = new_events.filtered(lambda x, t=event_type: x.event_type == t)
+            if bounced:
+                bounced.mapped("tracking_email_id")._partners_email_bounced_set(
+                    event_type, event=bounced
+                )
+        return new_events
+
     # TODO Remove useless method
     @api.model
     def event_process(self, request, post, metadata, event_type=None):
@@ -480,12 +690,53 @@ class MailTrackingEmail(models.Model):
         )
         return [("write_date", "<", target_write_date)]
 
+    def _gc_summary_key(self):
+        """Values of the summary line where the tracking email is accounted
+        before being deleted. Ready to be inherited"""
+        self.ensure_one()
+        return {"date": self.date, "state": self.state}
+
+    def _gc_summarize(self):
+        """Account the tracking emails in the summary table"""
+        counts = defaultdict(int)
+        for tracking in self:
+            counts[tuple(sorted(tracking._gc_summary_key().items()))] += 1
+        self.env["mail.tracking.email.summary"].sudo()._add_counts(counts)
+
+    def _gc_delete(self):
+        """Delete the tracking emails and their events.
+
+        :return: number of deleted tracking emails and tracking events
+        """
+        addresses = self.mapped("recipient_address")
+        self.flush()
+        self.env["mail.tracking.event"].flush()
+        self.env.cr.execute(
+            "DELETE FROM mail_tracking_event WHERE tracking_email_id IN %s",
+            (tuple(self.ids),),
+        )
+        event_count = self.env.cr.rowcount
+        # Using a direct query to avoid ORM as it causes an issue with
+        # a related field mass_mailing_id in customer DB when deleting
+        # the records. This might be 14.0 specific, so changing to
+        # .unlink() should be tested when forward porting.
+        query = "DELETE FROM mail_tracking_email WHERE id IN %s"
+        args = (tuple(self.ids),)
+        self.env.cr.execute(query, args)
+        email_count = self.env.cr.rowcount
+        self.invalidate_cache()
+        self.env["mail.tracking.event"].invalidate_cache()
+        self.env["mail.tracking.address"]._refresh_addresses_queue(addresses)
+        return email_count, event_count
+
     @api.autovacuum
     def _gc_mail_tracking_email(self, limit=5000):
-        config_max_age_days = (
-            self.env["ir.config_parameter"]
-            .sudo()
-            .get_param("mail_tracking.mail_tracking_email_max_age_days")
+        """Delete old tracking emails in chunks of ``limit`` records, committing
+        after each chunk, until there are no more or the time budget is spent.
+        Next runs will go on with the remaining records."""
+        icp = self.env["ir.config_parameter"].sudo()
+        config_max_age_days = icp.get_param(
+            "mail_tracking.mail_tracking_email_max_age_days"
         )
         try:
             max_age_days = int(config_max_age_days)
@@ -495,18 +746,154 @@ class MailTrackingEmail(models.Model):
         if not max_age_days > 0:
             return False
 
+        try:
+            time_budget = int(
+                icp.get_param("mail_tracking.mail_tracking_email_gc_time_budget", 300)
+            )
+        except ValueError:
+            time_budget = 300
+        summarize = icp.get_param("mail_tracking.mail_tracking_email_gc_summary")
+        auto_commit = not getattr(threading.currentThread(), "testing", False)
         domain = self._get_old_mail_tracking_email_domain(max_age_days)
-        records_to_delete = self.search(domain, limit=limit).exists()
-        if records_to_delete:
-            _logger.info(
-                "Deleting %s mail.tracking.email records", len(records_to_delete)
+        start = time.time()
+        last_id = email_count = event_count = 0
+        while time.time() - start < time_budget:
+            records_to_delete = self.search(
+                domain + [("id", ">", last_id)], limit=limit, order="id"
             )
-            self.flush()
-            # Using a direct query to avoid ORM as it causes an issue with
-            # a related field mass_mailing_id in customer DB when deleting
-            # the records. This might be 14.0 specific, so changing to
-            # .unlink() should be tested when forward porting.
-            query = "DELETE FROM mail_tracking_email WHERE id IN %s"
-            args = (tuple(records_to_delete.ids),)
-            self.env.cr.execute(query, args)
-            self.invalidate_cache()
+            if not records_to_delete:
+                break
+            last_id = records_to_delete[-1].id
+            if summarize:
+                records_to_delete._gc_summarize()
+            emails, events = records_to_delete._gc_delete()
+            email_count += emails
+            event_count += events
+            if auto_commit:
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+        _logger.info(
+            "Deleted %s mail.tracking.email and %s mail.tracking.event records "
+            "in %.1f seconds",
+            email_count,
+            event_count,
+            time.time() - start,
+        )
+        return email_count
+
+    @api.model
+    def _export_columns(self):
+        """Exported columns: list of (name, SQL expression) over the tracking
+        emails ``t`` left joined with their events ``e``"""
+        return [
+            ("tracking_email_id", "t.id"),
+            ("name", "t.name"),
+            ("time", "t.time"),
+            ("state", "t.state"),
+            ("recipient_address", "t.recipient_address"),
+            ("sender", "t.sender"),
+            ("mail_message_id", "t.mail_message_id"),
+            ("mail_id", "t.mail_id"),
+            ("partner_id", "t.partner_id"),
+            ("error_type", "t.error_type"),
+            ("bounce_type", "t.bounce_type"),
+            ("write_date", "t.write_date"),
+            ("event_id", "e.id"),
+            ("event_type", "e.event_type"),
+            ("event_time", "e.time"),
+            ("event_url", "e.url"),
+            ("event_ip", "e.ip"),
+            ("event_mobile", "e.mobile"),
+            ("event_os_family", "e.os_family"),
+            ("event_ua_family", "e.ua_family"),
+            ("event_ua_type", "e.ua_type"),
+            ("event_user_country_id", "e.user_country_id"),
+            ("event_error_type", "e.error_type"),
+        ]
+
+    @api.model
+    def _export_watermark(self):
+        """Latest modification date of the tracking emails, to be used as the
+        upper bound of an export and as the lower bound of the next one"""
+        self.flush(["write_date"])
+        self.env.cr.execute("SELECT MAX(write_date) FROM mail_tracking_email")
+        watermark = self.env.cr.fetchone()[0]
+        return str(watermark) if watermark else False
+
+    @api.model
+    def _export_watermark_parse(self, watermark):
+        """Datetime of a watermark returned by ``_export_watermark``, raise a
+        ValueError if it isn't valid"""
+        for date_format in EXPORT_WATERMARK_FORMATS:
+            try:
+                return datetime.strptime(watermark, date_format)
+            except (TypeError, ValueError):
+                continue
+        raise ValueError("Invalid export watermark: %s" % watermark)
+
+    @api.model
+    def _export_chunks(self, fmt="csv", since=None, until=None, batch_size=None):
+        """Stream the tracking emails joined with their events as CSV or
+        NDJSON encoded chunks.
+
+        Rows are read from a server side cursor in batches of ``batch_size``,
+        so memory doesn't depend on the number of exported rows. Only the
+        tracking emails modified after ``since`` and up to ``until`` (as
+        returned by ``_export_watermark``) are exported, with all their events.
+        The tracking emails modified up to ``EXPORT_WATERMARK_OVERLAP`` seconds
+        before ``since`` are exported again, so consumers must upsert the rows
+        by id. ACLs aren't checked, callers must restrict the access.
+        """
+        if fmt not in ("csv", "ndjson"):
+            raise ValueError("Unsupported export format: %s" % fmt)
+        if since:
+            since = self._export_watermark_parse(since) - timedelta(
+                seconds=EXPORT_WATERMARK_OVERLAP
+            )
+        columns = self._export_columns()
+        names = [name for name, __ in columns]
+        where, params = ["TRUE"], []
+        if since:
+            where.append("t.write_date > %s")
+            params.append(since)
+        if until:
+            where.append("t.write_date <= %s")
+            params.append(until)
+        self.flush()
+        self.env["mail.tracking.event"].flush()
+        self.env.cr.execute(
+            """
+            DECLARE mail_tracking_export NO SCROLL CURSOR FOR
+            SELECT {columns}
+            FROM mail_tracking_email t
+            LEFT JOIN mail_tracking_event e ON e.tracking_email_id = t.id
+            WHERE {where}
+            ORDER BY t.id, e.id
+            """.format(
+                columns=", ".join(expression for __, expression in columns),
+                where=" AND ".join(where),
+            ),
+            params,
+        )
+        try:
+            if fmt == "csv":
+                buffer = io.StringIO()
+                csv.writer(buffer).writerow(names)
+                yield buffer.getvalue().encode()
+            while True:
+                self.env.cr.execute(
+                    "FETCH FORWARD %s FROM mail_tracking_export",
+                    (batch_size or EXPORT_BATCH_SIZE,),
+                )
+                rows = self.env.cr.fetchall()
+                if not rows:
+                    break
+                buffer = io.StringIO()
+                if fmt == "csv":
+                    csv.writer(buffer).writerows(rows)
+                else:
+                    for row in rows:
+                        buffer.write(json.dumps(dict(zip(names, row)), default=str))
+                        buffer.write("\n")
+                yield buffer.getvalue().encode()
+        finally:
+            self.env.cr.execute("CLOSE mail_tracking_export")
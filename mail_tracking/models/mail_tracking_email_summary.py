@@ -0,0 +1,36 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, fields, models
+
+
+class MailTrackingEmailSummary(models.Model):
+    """Number of tracking emails per day and state, kept when old tracking
+    emails are deleted by the autovacuum"""
+
+    _name = "mail.tracking.email.summary"
+    _description = "MailTracking email summary"
+    _order = "date desc"
+    _rec_name = "date"
+
+    date = fields.Date(readonly=True, index=True)
+    state = fields.Selection(selection="_selection_state", readonly=True)
+    count = fields.Integer(readonly=True)
+
+    @api.model
+    def _selection_state(self):
+        return self.env["mail.tracking.email"]._fields["state"].selection
+
+    @api.model
+    def _add_counts(self, counts):
+        """Add the given counts to the summary lines.
+
+        :param counts: dictionary of counts indexed by the summary line values,
+            as a sorted tuple of (field, value) items
+        """
+        for key, count in counts.items():
+            vals = dict(key)
+            summary = self.search([(name, "=", value) for name, value in key], limit=1)
+            if summary:
+                summary.count += count
+            else:
+                self.create(dict(vals, count=count))
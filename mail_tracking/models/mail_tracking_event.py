@@ -3,6 +3,7 @@
 
 import re
 import time
+from collections import defaultdict
 from datetime import datetime
 
 from odoo import api, fields, models
@@ -85,6 +86,32 @@ class MailTrackingEvent(models.Model):
         for email in self:
             email.date = fields.Date.to_string(fields.Date.from_string(email.time))
 
+    def _tracking_email_write(self, tracking_email, vals):
+        """Write the values of an event in its tracking email. When the event
+        is processed in a batch of ``mail.tracking.email.event_create_batch``,
+        they're collected instead, and written by ``_process_batch_flush``"""
+        batch = self.env.context.get("mail_tracking_event_batch")
+        if batch is not None:
+            # The last event of each tracking email sets its final values
+            batch["tracking_vals"][tracking_email.id].update(vals)
+        else:
+            tracking_email.sudo().write(vals)
+
+    @api.model
+    def _process_batch_flush(self, batch):
+        """Apply what the ``process_*`` methods collected while processing a
+        batch of events. The ``process_*`` methods are the extension point of
+        both the single and the batch processing: inherit this method to apply
+        at once the side effects that your ``process_*`` overrides collect in
+        the ``mail_tracking_event_batch`` context dictionary"""
+        grouped_ids = defaultdict(list)
+        for tracking_id, vals in batch["tracking_vals"].items():
+            grouped_ids[tuple(sorted(vals.items()))].append(tracking_id)
+        tracking_email_obj = self.env["mail.tracking.email"].sudo()
+        for vals, tracking_ids in grouped_ids.items():
+            tracking_email_obj.browse(tracking_ids).write(dict(vals))
+        return True
+
     def _process_data(self, tracking_email, metadata, event_type, state):
         ts = time.time()
         dt = datetime.utcfromtimestamp(ts)
@@ -109,16 +136,17 @@ class MailTrackingEvent(models.Model):
         }
 
     def _process_status(self, tracking_email, metadata, event_type, state):
-        tracking_email.sudo().write({"state": state})
+        self._tracking_email_write(tracking_email, {"state": state})
         return self._process_data(tracking_email, metadata, event_type, state)
 
     def _process_bounce(self, tracking_email, metadata, event_type, state):
-        tracking_email.sudo().write(
+        self._tracking_email_write(
+            tracking_email,
             {
                 "state": state,
                 "bounce_type": metadata.get("bounce_type", False),
                 "bounce_description": metadata.get("bounce_description", False),
-            }
+            },
         )
         return self._process_data(tracking_email, metadata, event_type, state)
 
@@ -0,0 +1,95 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import json
+import logging
+import threading
+import time
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class MailTrackingEventBuffer(models.Model):
+    """Tracking events received by the open tracking image when the
+    ``mail_tracking_open_buffer`` server option is enabled. They are inserted
+    with raw SQL by the controller, without loading an environment, and
+    converted into ``mail.tracking.event`` records in bulk by a scheduled
+    action.
+    """
+
+    _name = "mail.tracking.event.buffer"
+    _description = "MailTracking buffered event"
+    _order = "id"
+    _log_access = False
+
+    tracking_email_id = fields.Many2one(
+        comodel_name="mail.tracking.email",
+        required=True,
+        readonly=True,
+        ondelete="cascade",
+        index=True,
+    )
+    event_type = fields.Char(required=True, readonly=True)
+    metadata = fields.Text(readonly=True)
+
+    def _flush_events(self):
+        """Create the tracking events of the buffered events and remove them.
+        As done by the non buffered open tracking image, only the first event
+        of each tracking email is kept, and only if it isn't opened yet."""
+        tracking_email_obj = self.env["mail.tracking.email"].sudo()
+        first_events = {}
+        for buffered in self:
+            first_events.setdefault(
+                (buffered.tracking_email_id, buffered.event_type), buffered
+            )
+        events = [
+            (tracking_email.id, event_type, json.loads(buffered.metadata or "{}"))
+            for (tracking_email, event_type), buffered in first_events.items()
+            if tracking_email.state in ("sent", "delivered")
+        ]
+        res = tracking_email_obj.event_create_batch(events)
+        self.unlink()
+        return res
+
+    @api.model
+    def _cron_flush_events(self, limit=5000, time_budget=50):
+        """Flush the oldest buffered events in batches of ``limit`` events,
+        skipping the ones being flushed by other workers, until the buffer is
+        empty or the time budget (in seconds) is consumed"""
+        auto_commit = not getattr(threading.currentThread(), "testing", False)
+        start = time.time()
+        total = last_id = 0
+        while time.time() - start < time_budget:
+            self.env.cr.execute(
+                """
+                SELECT id FROM mail_tracking_event_buffer
+                WHERE id > %s
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+                """,
+                (last_id, limit),
+            )
+            ids = [row[0] for row in self.env.cr.fetchall()]
+            if not ids:
+                break
+            last_id = ids[-1]
+            events = self.browse(ids)._flush_events()
+            _logger.info(
+                "Flushed %s buffered tracking events into %s events",
+                len(ids),
+                len(events),
+            )
+            total += len(ids)
+            if auto_commit:
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+        if total and time.time() - start >= time_budget:
+            # Go on as soon as possible with the remaining events
+            cron = self.env.ref(
+                "mail_tracking.ir_cron_flush_tracking_event_buffer",
+                raise_if_not_found=False,
+            )
+            if cron:
+                cron._trigger()
+        return True
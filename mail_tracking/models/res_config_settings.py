@@ -14,3 +14,16 @@ class ResConfigSettings(models.TransientModel):
         help="If set as positive integer enables the deletion of "
         "old mail tracking records to reduce the database size.",
     )
+    mail_tracking_email_gc_summary = fields.Boolean(
+        "Keep a summary of deleted mail tracking email records",
+        config_parameter="mail_tracking.mail_tracking_email_gc_summary",
+        help="Before deleting old mail tracking records, count them per day "
+        "and state in a summary table.",
+    )
+    mail_tracking_email_gc_time_budget = fields.Integer(
+        "Max seconds per deletion run",
+        config_parameter="mail_tracking.mail_tracking_email_gc_time_budget",
+        default=300,
+        help="Old mail tracking records are deleted in chunks until this time "
+        "is spent. Remaining records are deleted by the next runs.",
+    )
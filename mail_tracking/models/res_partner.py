@@ -20,13 +20,23 @@ class ResPartner(models.Model):
         self.email_score = 50.0
         self.tracking_emails_count = 0
         partners_mail = self.filtered("email")
-        mt_obj = self.env["mail.tracking.email"].sudo()
+        scores = (
+            self.env["mail.tracking.email"]
+            .sudo()
+            .email_score_from_emails(partners_mail.mapped("email"))
+        )
+        # We don't want performance issues due to heavy ACLs check for large
+        # recordsets. Our option is to hide the number for regular users.
+        show_count = self.env.user.has_group("base.group_system")
+        addresses = (
+            self.env["mail.tracking.address"]
+            .sudo()
+            ._get_addresses(partners_mail.mapped("email"))
+            if show_count
+            else {}
+        )
         for partner in partners_mail:
-            partner.email_score = mt_obj.email_score_from_email(partner.email)
-            # We don't want performance issues due to heavy ACLs check for large
-            # recordsets. Our option is to hide the number for regular users.
-            if not self.env.user.has_group("base.group_system"):
-                continue
-            partner.tracking_emails_count = len(
-                mt_obj._search([("recipient_address", "=", partner.email.lower())])
-            )
+            email = partner.email.lower()
+            partner.email_score = scores[email]
+            if email in addresses:
+                partner.tracking_emails_count = addresses[email].total_count
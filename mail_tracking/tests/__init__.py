@@ -3,3 +3,6 @@
 
 from . import test_mail_tracking
 from . import test_gc_mail_tracking_email
+from . import test_event_create_batch
+from . import test_tracking_img
+from . import test_tracking_acl
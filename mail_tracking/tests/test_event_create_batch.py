@@ -0,0 +1,128 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import logging
+import time
+
+import mock
+
+from odoo.tests.common import TransactionCase
+
+_logger = logging.getLogger(__name__)
+
+
+class TestEventCreateBatch(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.recipient = self.env["res.partner"].create(
+            {"name": "Test recipient", "email": "recipient@example.com"}
+        )
+        self.ts = time.time()
+
+    def _create_trackings(self, count):
+        return self.env["mail.tracking.email"].create(
+            [
+                {
+                    "name": "Test subject %s" % i,
+                    "recipient": "recipient%s@example.com" % i,
+                    "partner_id": self.recipient.id,
+                    "state": "sent",
+                }
+                for i in range(count)
+            ]
+        )
+
+    def test_event_create_batch(self):
+        trackings = self._create_trackings(3)
+        events = self.env["mail.tracking.email"].event_create_batch(
+            [
+                (trackings[0].id, "delivered", {"timestamp": self.ts}),
+                (trackings[0].id, "open", {"timestamp": self.ts + 1}),
+                (trackings[1].id, "delivered", {"timestamp": self.ts}),
+                (trackings[2].id, "soft_bounce", {"bounce_type": "mailbox"}),
+            ]
+        )
+        self.assertEqual(len(events), 4)
+        self.assertEqual(
+            trackings.mapped("state"), ["opened", "delivered", "soft-bounced"]
+        )
+        self.assertEqual(trackings[2].bounce_type, "mailbox")
+
+    def test_event_create_batch_process_methods(self):
+        trackings = self._create_trackings(2)
+        event_obj = self.env["mail.tracking.event"]
+        process_delivered = type(event_obj).process_delivered
+        # Overrides of the process methods apply to the batch processing
+        with mock.patch.object(
+            type(event_obj),
+            "process_delivered",
+            side_effect=process_delivered,
+            autospec=True,
+        ) as mock_process:
+            self.env["mail.tracking.email"].event_create_batch(
+                [(tracking.id, "delivered", {}) for tracking in trackings]
+            )
+        self.assertEqual(mock_process.call_count, 2)
+        self.assertEqual(trackings.mapped("state"), ["delivered", "delivered"])
+
+    def test_event_create_batch_concurrent(self):
+        tracking = self._create_trackings(1)
+        tracking.event_create("open", {"timestamp": self.ts})
+        url = "https://www.example.com/route/1"
+        events = self.env["mail.tracking.email"].event_create_batch(
+            [
+                # Concurrent with the stored open event
+                (tracking.id, "open", {"timestamp": self.ts + 2}),
+                (tracking.id, "open", {"timestamp": self.ts + 350}),
+                # Concurrent with the previous open event in the batch
+                (tracking.id, "open", {"timestamp": self.ts + 352}),
+                (tracking.id, "click", {"timestamp": self.ts, "url": url}),
+                (tracking.id, "click", {"timestamp": self.ts + 2, "url": url}),
+                (tracking.id, "click", {"timestamp": self.ts + 2, "url": url + "2"}),
+            ]
+        )
+        self.assertEqual(events.mapped("event_type"), ["open", "click", "click"])
+        self.assertEqual(len(tracking.tracking_event_ids), 4)
+
+    def test_event_create_batch_bounce(self):
+        tracking = self._create_trackings(1)
+        tracking.recipient = self.recipient.email
+        self.env["mail.tracking.email"].event_create_batch(
+            [(tracking.id, "hard_bounce", {})]
+        )
+        self.assertEqual(tracking.state, "bounced")
+        self.assertTrue(self.recipient.email_bounced)
+
+    def test_event_create_batch_benchmark(self):
+        count = 200
+        trackings = self._create_trackings(count * 2)
+        single, batch = trackings[:count], trackings[count:]
+        event_types = ["delivered", "open", "click"]
+        self.env["mail.tracking.email"].flush()
+        queries = self.cr.sql_log_count
+        start = time.time()
+        for i, tracking in enumerate(single):
+            tracking.event_create(event_types[i % 3], {"timestamp": self.ts})
+        self.env["mail.tracking.event"].flush()
+        single_time = time.time() - start
+        single_queries = self.cr.sql_log_count - queries
+        queries = self.cr.sql_log_count
+        start = time.time()
+        self.env["mail.tracking.email"].event_create_batch(
+            [
+                (tracking.id, event_types[i % 3], {"timestamp": self.ts})
+                for i, tracking in enumerate(batch)
+            ]
+        )
+        self.env["mail.tracking.event"].flush()
+        batch_time = time.time() - start
+        batch_queries = self.cr.sql_log_count - queries
+        _logger.info(
+            "event_create: %.0f events/s (%s queries), "
+            "event_create_batch: %.0f events/s (%s queries)",
+            count / single_time,
+            single_queries,
+            count / batch_time,
+            batch_queries,
+        )
+        self.assertEqual(single.mapped("state"), batch.mapped("state"))
+        self.assertLess(batch_queries, single_queries)
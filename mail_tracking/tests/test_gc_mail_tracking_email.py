@@ -85,3 +85,30 @@ class TestMailTrackingEmailCleanUp(SavepointCase):
         self.assertEqual(
             len(self.env["mail.tracking.email"].search(self.domain)), self.recent_count
         )
+
+    def test_deletion_summary_and_chunks(self):
+        self._set_write_date()
+        event = self.env["mail.tracking.event"].create(
+            {
+                "tracking_email_id": self.old_mail_tracking_email.id,
+                "event_type": "open",
+            }
+        )
+        other_old = self.env["mail.tracking.email"].create(
+            {"mail_message_id": self.message.id}
+        )
+        self.env.cr.execute(
+            "UPDATE mail_tracking_email SET write_date = write_date - interval '400 days'"
+            " WHERE id = %s",
+            (other_old.id,),
+        )
+        self.env["ir.config_parameter"].set_param(
+            "mail_tracking.mail_tracking_email_gc_summary", "True"
+        )
+        # Chunks of one record
+        deleted = self.env["mail.tracking.email"]._gc_mail_tracking_email(limit=1)
+        self.assertEqual(deleted, 2)
+        self.assertFalse(event.exists())
+        self.assertTrue(self.recent_mail_tracking_email.exists())
+        summary = self.env["mail.tracking.email.summary"].search([])
+        self.assertEqual(sum(summary.mapped("count")), 2)
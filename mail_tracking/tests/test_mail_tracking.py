@@ -2,7 +2,11 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 import base64
+import csv
+import io
+import json
 import time
+from datetime import datetime
 
 import mock
 import psycopg2
@@ -11,9 +15,10 @@ import psycopg2.errorcodes
 from odoo import http
 from odoo.tests import users
 from odoo.tests.common import TransactionCase
-from odoo.tools import mute_logger
+from odoo.tools import config, mute_logger
 
-from ..controllers.main import BLANK, MailTrackingController
+from ..controllers.main import BLANK, SIGNING_SECRETS, MailTrackingController
+from ..models.mail_tracking_email import tracking_img_signature
 
 mock_send_email = "odoo.addons.base.models.ir_mail_server." "IrMailServer.send_email"
 
@@ -330,15 +335,73 @@ class TestMailTracking(TransactionCase):
         self.assertTrue(messages)
         self.assertTrue(messages_failed)
         self.assertTrue(len(messages) > len(messages_failed))
+        self.assertEqual(failed_count, len(messages_failed))
+        self.assertEqual(
+            len(messages),
+            len(messages_failed)
+            + MailMessageObj.search_count([["is_failed_message", "=", False]]),
+        )
         tracking.mail_message_id.set_need_action_done()
         self.assertFalse(tracking.mail_message_id.mail_tracking_needs_action)
         self.assertTrue(MailMessageObj.get_failed_count() < failed_count)
+        # Review all the failed messages
+        tracking.mail_message_id.mail_tracking_needs_action = True
+        reviewed_ids = MailMessageObj.set_all_as_reviewed()
+        self.assertIn(tracking.mail_message_id.id, reviewed_ids)
+        self.assertFalse(MailMessageObj.get_failed_count())
         # No author_id
         tracking.mail_message_id.author_id = False
         values = tracking.mail_message_id.get_failed_messages()[0]
         if values and values.get("author"):
             self.assertEqual(values["author"][0], -1)
 
+    def test_tracking_status_notifications(self):
+        bus_obj = self.env["bus.bus"]
+        messages = self.env["mail.message"].create(
+            [
+                {
+                    "model": "res.partner",
+                    "res_id": self.recipient.id,
+                    "author_id": self.env.user.partner_id.id,
+                    "body": "<p>Test message %s</p>" % i,
+                    "mail_tracking_needs_action": True,
+                }
+                for i in range(10)
+            ]
+        )
+        self.env.cr.precommit.run()
+        last_id = bus_obj.search([], order="id desc", limit=1).id or 0
+        for message in messages:
+            message.set_need_action_done()
+        # Toggled back in the same transaction
+        messages[0]._tracking_needs_action_set()
+        self.env.cr.precommit.run()
+        notifications = bus_obj.search([("id", ">", last_id)])
+        self.assertEqual(len(notifications), 1)
+        payload = json.loads(notifications.message)
+        self.assertEqual(payload["type"], "toggle_tracking_status")
+        self.assertFalse(payload["needs_actions"])
+        self.assertEqual(sorted(payload["message_ids"]), sorted(messages[1:].ids))
+        # Failed tracking emails notify the message author
+        last_id = notifications.id
+        self.env["mail.tracking.email"].create(
+            [
+                {
+                    "name": "Test subject",
+                    "recipient": "recipient@example.com",
+                    "mail_message_id": message.id,
+                    "state": "bounced",
+                }
+                for message in messages[1:]
+            ]
+        )
+        self.env.cr.precommit.run()
+        notifications = bus_obj.search([("id", ">", last_id)])
+        self.assertEqual(len(notifications), 1)
+        payload = json.loads(notifications.message)
+        self.assertTrue(payload["needs_actions"])
+        self.assertEqual(len(payload["message_ids"]), 9)
+
     def test_resend_failed_message(self):
         # This message will generate a notification for recipient
         message = self.env["mail.message"].create(
@@ -413,6 +476,64 @@ class TestMailTracking(TransactionCase):
             # Two events again because no tracking_email_id found for False
             self.assertEqual(2, len(tracking.tracking_event_ids))
 
+    def test_mail_send_batch(self):
+        mails = self.env["mail.mail"].create(
+            [
+                {
+                    "subject": "Test subject %s" % i,
+                    "email_from": "from@domain.com",
+                    "email_to": "to%s@example.com" % i,
+                    "recipient_ids": [(6, 0, (self.sender | self.recipient).ids)],
+                    "body_html": "<p>This is a test message</p>",
+                    "auto_delete": False,
+                }
+                for i in range(3)
+            ]
+        )
+        trackings = mails.sudo()._tracking_emails_create()
+        self.assertEqual(len(trackings), 9)
+        self.assertEqual(
+            self.env["mail.tracking.email"]
+            .browse(trackings[(mails[0].id, self.sender.id)])
+            .recipient_address,
+            "sender@example.com",
+        )
+        self.env["mail.tracking.email"].browse(trackings.values()).unlink()
+        mails.send()
+        for i, mail in enumerate(mails):
+            tracking_emails = self.env["mail.tracking.email"].search(
+                [("mail_id", "=", mail.id)]
+            )
+            self.assertEqual(
+                set(tracking_emails.mapped("recipient_address")),
+                {"to%s@example.com" % i, "sender@example.com", "recipient@example.com"},
+            )
+
+    @mute_logger("odoo.addons.mail.models.mail_mail")
+    def test_mail_send_batch_unused(self):
+        mails = self.env["mail.mail"].create(
+            [
+                {
+                    "subject": "Test subject %s" % i,
+                    "email_from": "from@domain.com",
+                    "email_to": "to%s@example.com" % i,
+                    "body_html": "<p>This is a test message</p>",
+                    "auto_delete": False,
+                }
+                for i in range(2)
+            ]
+        )
+        with mock.patch.object(
+            type(self.env["mail.mail"]),
+            "_send_prepare_values",
+            side_effect=Exception("Test error"),
+        ):
+            mails.send()
+        self.assertEqual(mails.mapped("state"), ["exception", "exception"])
+        self.assertFalse(
+            self.env["mail.tracking.email"].search([("mail_id", "in", mails.ids)])
+        )
+
     def test_mail_tracking_open(self):
         controller = MailTrackingController()
         db = self.env.cr.dbname
@@ -447,6 +568,110 @@ class TestMailTracking(TransactionCase):
             controller.mail_tracking_open(db, tracking.id, False)
             self.assertEqual(2, len(tracking.tracking_event_ids))
 
+    def test_mail_tracking_open_signed(self):
+        controller = MailTrackingController()
+        db = self.env.cr.dbname
+        self.env["ir.config_parameter"].set_param("mail_tracking.signed_urls", "1")
+        mail, tracking = self.mail_send(self.recipient.email)
+        secret = self.env["ir.config_parameter"].get_param("database.secret")
+        signature = tracking_img_signature(secret, tracking.id)
+        tracking_img = tracking._get_mail_tracking_img()
+        self.assertIn("/%s/%s/blank.gif" % (tracking.id, signature), tracking_img)
+        self.assertNotIn(tracking.token, tracking_img)
+        with mock.patch("odoo.http.db_filter") as mock_client:
+            mock_client.return_value = True
+            # Signature of another tracking email
+            controller.mail_tracking_open(
+                db, tracking.id, tracking_img_signature(secret, tracking.id + 1)
+            )
+            self.assertEqual(1, len(tracking.tracking_event_ids))
+            controller.mail_tracking_open(db, tracking.id, signature)
+            self.assertEqual(2, len(tracking.tracking_event_ids))
+            # Token URLs are still valid
+            mail, tracking = self.mail_send(self.recipient.email)
+            controller.mail_tracking_open(db, tracking.id, tracking.token)
+            self.assertEqual(2, len(tracking.tracking_event_ids))
+
+    def test_mail_tracking_open_buffer(self):
+        controller = MailTrackingController()
+        db = self.env.cr.dbname
+        buffer_obj = self.env["mail.tracking.event.buffer"]
+        mail, tracking = self.mail_send(self.recipient.email)
+        with mock.patch("odoo.http.db_filter") as mock_client, mock.patch.dict(
+            config.options, {"mail_tracking_open_buffer": True}
+        ):
+            mock_client.return_value = True
+            res = controller.mail_tracking_open(db, tracking.id, tracking.token)
+            self.assertEqual(base64.b64decode(BLANK), res.response[0])
+            controller.mail_tracking_open(db, tracking.id, tracking.token)
+            # Wrong token
+            controller.mail_tracking_open(db, tracking.id, "tokentest")
+        self.assertEqual(1, len(tracking.tracking_event_ids))
+        self.assertEqual(2, buffer_obj.search_count([]))
+        # The events are dated when opened, not when flushed
+        opened_ts = json.loads(buffer_obj.search([], limit=1).metadata)["timestamp"]
+        with mock.patch.object(time, "time", return_value=opened_ts + 3600):
+            buffer_obj._cron_flush_events()
+        self.assertFalse(buffer_obj.search([]))
+        tracking.invalidate_cache()
+        self.assertEqual(2, len(tracking.tracking_event_ids))
+        self.assertEqual("opened", tracking.state)
+        open_event = tracking.tracking_event_ids.filtered(
+            lambda event: event.event_type == "open"
+        )
+        self.assertAlmostEqual(open_event.timestamp, opened_ts, places=3)
+        self.assertEqual(
+            open_event.time, datetime.utcfromtimestamp(opened_ts).replace(microsecond=0)
+        )
+
+    def test_mail_tracking_signature_secret_rotated(self):
+        controller = MailTrackingController()
+        icp = self.env["ir.config_parameter"]
+        mail, tracking = self.mail_send(self.recipient.email)
+        SIGNING_SECRETS.pop(self.env.cr.dbname, None)
+        signature = tracking_img_signature(
+            icp.get_param("database.secret"), tracking.id
+        )
+        self.assertTrue(
+            controller._mail_tracking_signature_check(self.cr, tracking.id, signature)
+        )
+        icp.set_param("database.secret", "rotated")
+        icp.flush()
+        signature = tracking_img_signature("rotated", tracking.id)
+        # Cached until it expires
+        self.assertFalse(
+            controller._mail_tracking_signature_check(self.cr, tracking.id, signature)
+        )
+        with mock.patch.object(time, "time", return_value=time.time() + 3600):
+            self.assertTrue(
+                controller._mail_tracking_signature_check(
+                    self.cr, tracking.id, signature
+                )
+            )
+
+    def test_mail_tracking_buffer_batches(self):
+        buffer_obj = self.env["mail.tracking.event.buffer"]
+        trackings = self.env["mail.tracking.email"].create(
+            [
+                {
+                    "name": "Test subject %s" % i,
+                    "recipient": self.recipient.email,
+                    "state": "sent",
+                }
+                for i in range(3)
+            ]
+        )
+        buffer_obj.create(
+            [
+                {"tracking_email_id": tracking.id, "event_type": "open"}
+                for tracking in trackings
+            ]
+        )
+        # The whole buffer is flushed in several batches
+        buffer_obj._cron_flush_events(limit=1)
+        self.assertFalse(buffer_obj.search([]))
+        self.assertEqual(trackings.mapped("state"), ["opened"] * 3)
+
     def test_concurrent_open(self):
         mail, tracking = self.mail_send(self.recipient.email)
         ts = time.time()
@@ -594,6 +819,177 @@ class TestMailTracking(TransactionCase):
         new_partner.email = self.recipient.email
         self.assertTrue(new_partner.email_bounced)
 
+    def test_partners_email_bounced_set_bulk(self):
+        partners = self.env["res.partner"].create(
+            [
+                {"name": "Test bounced %s" % i, "email": "Bounced%s@Example.com" % i}
+                for i in range(5)
+            ]
+        )
+        trackings = self.env["mail.tracking.email"].create(
+            [
+                {"name": "Test subject", "recipient": "bounced%s@example.com" % i}
+                for i in range(5)
+            ]
+        )
+        self.assertEqual(
+            set(
+                self.env["res.partner"]
+                ._search_primary_emails(trackings.mapped("recipient_address"))
+                .ids
+            ),
+            set(partners.ids),
+        )
+        trackings._partners_email_bounced_set("error")
+        self.assertTrue(all(partners.mapped("email_bounced")))
+
+    def test_tracking_address(self):
+        address_obj = self.env["mail.tracking.address"]
+        mail, tracking = self.mail_send(self.recipient.email)
+        tracking.event_create("delivered", {})
+        mail, tracking = self.mail_send(self.recipient.email)
+        tracking.event_create("hard_bounce", {})
+        address = address_obj.search([("recipient_address", "=", self.recipient.email)])
+        self.assertEqual(address.total_count, 2)
+        self.assertEqual(address.delivered_count, 1)
+        self.assertEqual(address.bounced_count, 1)
+        self.assertEqual(address.last_state, "bounced")
+        self.assertEqual(address.score, 26.0)
+        self.assertTrue(
+            self.env["mail.tracking.email"].email_is_bounced(self.recipient.email)
+        )
+        other = self.env["res.partner"].create(
+            {"name": "Other recipient", "email": "other@example.com"}
+        )
+        partners = self.recipient | other
+        partners.invalidate_cache()
+        self.assertEqual(partners.mapped("email_score"), [26.0, 50.0])
+        self.assertEqual(partners.mapped("tracking_emails_count"), [2, 0])
+        # Removed trackings are removed from the statistics
+        tracking.write({"recipient": "other@example.com"})
+        self.assertEqual(address.total_count, 1)
+        self.assertEqual(address.last_state, "delivered")
+        self.assertEqual(
+            address_obj.search(
+                [("recipient_address", "=", "other@example.com")]
+            ).bounced_count,
+            1,
+        )
+
+    def test_tracking_address_deferred(self):
+        address_obj = self.env["mail.tracking.address"]
+        trackings = self.env["mail.tracking.email"].create(
+            [
+                {
+                    "name": "Test subject %s" % i,
+                    "recipient": self.recipient.email,
+                    "state": "sent",
+                }
+                for i in range(3)
+            ]
+        )
+        trackings[0].state = "delivered"
+        trackings[1].state = "opened"
+        refresh = type(address_obj)._refresh_addresses
+        # The changes of the transaction are refreshed at once
+        with mock.patch.object(
+            type(address_obj), "_refresh_addresses", side_effect=refresh, autospec=True
+        ) as mock_refresh:
+            address = address_obj.search(
+                [("recipient_address", "=", self.recipient.email)]
+            )
+        mock_refresh.assert_called_once()
+        self.assertEqual(address.total_count, 3)
+        self.assertEqual(address.opened_count, 1)
+        self.assertEqual(address.sent_count, 1)
+
+    def test_tracking_status_query_count(self):
+        """The query count doesn't depend on the number of messages"""
+        messages = self.env["mail.message"]
+        for i in range(10):
+            messages |= self.env["mail.message"].create(
+                {
+                    "subject": "Message test %s" % i,
+                    "author_id": self.sender.id,
+                    "email_from": self.sender.email,
+                    "message_type": "comment",
+                    "model": "res.partner",
+                    "res_id": self.recipient.id,
+                    "partner_ids": [(4, self.recipient.id)],
+                    "email_cc": "unnamed%s@test.com, sender@example.com" % i,
+                    "body": "<p>This is a test message</p>",
+                }
+            )
+            self.env["mail.tracking.email"].create(
+                {
+                    "name": "Message test %s" % i,
+                    "mail_message_id": messages[-1:].id,
+                    "partner_id": self.recipient.id,
+                    "recipient": self.recipient.email,
+                    "state": "sent",
+                }
+            )
+        self.env["base"].flush()
+        query_counts = []
+        for batch in (messages[:1], messages):
+            batch.invalidate_cache()
+            queries = self.cr.sql_log_count
+            statuses = batch.tracking_status()
+            query_counts.append(self.cr.sql_log_count - queries)
+            self.assertEqual(len(statuses), len(batch))
+        self.assertEqual(len(statuses[messages[-1].id]["partner_trackings"]), 3)
+        # Allow some slack for the prefetching of related records
+        self.assertLessEqual(query_counts[1], query_counts[0] + 3)
+
+    def test_export_chunks(self):
+        mail, tracking = self.mail_send(self.recipient.email)
+        tracking.event_create("open", {})
+        tracking_obj = self.env["mail.tracking.email"]
+        watermark = tracking_obj._export_watermark()
+        rows = list(
+            csv.reader(
+                io.StringIO(
+                    b"".join(tracking_obj._export_chunks("csv", batch_size=1)).decode()
+                )
+            )
+        )
+        self.assertEqual(rows[0][0], "tracking_email_id")
+        exported = [row for row in rows[1:] if row[0] == str(tracking.id)]
+        self.assertEqual(len(exported), len(tracking.tracking_event_ids))
+        # Incremental export, the rows changed shortly before the watermark
+        # are exported again
+        self.assertIn(
+            b'"tracking_email_id": %d' % tracking.id,
+            b"".join(tracking_obj._export_chunks("ndjson", since=watermark)),
+        )
+        self.env.cr.execute(
+            "UPDATE mail_tracking_email SET write_date = write_date - interval '1 hour'"
+            " WHERE id = %s",
+            (tracking.id,),
+        )
+        self.assertNotIn(
+            b'"tracking_email_id": %d' % tracking.id,
+            b"".join(tracking_obj._export_chunks("ndjson", since=watermark)),
+        )
+        self.env.cr.execute(
+            "UPDATE mail_tracking_email SET write_date = write_date + interval '2 hour'"
+            " WHERE id = %s",
+            (tracking.id,),
+        )
+        lines = b"".join(
+            tracking_obj._export_chunks("ndjson", since=watermark)
+        ).splitlines()
+        self.assertEqual(
+            {
+                json.loads(line)["event_type"]
+                for line in lines
+                if json.loads(line)["tracking_email_id"] == tracking.id
+            },
+            {"sent", "open"},
+        )
+        with self.assertRaises(ValueError):
+            list(tracking_obj._export_chunks("ndjson", since="yesterday"))
+
     def test_recordset_email_score(self):
         """For backwords compatibility sake"""
         trackings = self.env["mail.tracking.email"]
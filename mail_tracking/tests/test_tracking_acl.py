@@ -0,0 +1,195 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import logging
+import time
+
+from odoo.exceptions import AccessError
+from odoo.tests.common import TransactionCase
+
+_logger = logging.getLogger(__name__)
+
+
+class TestTrackingAcl(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.env["res.users"].create(
+            {
+                "name": "Tracking user",
+                "login": "tracking-acl-user",
+                "groups_id": [(6, 0, [self.env.ref("base.group_user").id])],
+            }
+        )
+        self.recipient = self.env["res.partner"].create(
+            {"name": "Test recipient", "email": "recipient@example.com"}
+        )
+        # Private channel the user isn't a member of
+        self.channel = self.env["mail.channel"].create(
+            {"name": "Private channel", "public": "private"}
+        )
+
+    def _create_trackings(self, count):
+        """Interleave trackings of readable and unreadable messages"""
+        message_obj = self.env["mail.message"]
+        readable = message_obj.create(
+            {
+                "model": "res.partner",
+                "res_id": self.recipient.id,
+                "message_type": "comment",
+                "body": "<p>Readable message</p>",
+            }
+        )
+        unreadable = message_obj.create(
+            {
+                "model": "mail.channel",
+                "res_id": self.channel.id,
+                "message_type": "comment",
+                "body": "<p>Unreadable message</p>",
+            }
+        )
+        return self.env["mail.tracking.email"].create(
+            [
+                {
+                    "name": "Test subject %s" % i,
+                    "recipient": "recipient%s@example.com" % i,
+                    "mail_message_id": (readable if i % 2 else unreadable).id,
+                    "state": "sent",
+                }
+                for i in range(count * 2)
+            ]
+        )
+
+    def test_search_pagination(self):
+        trackings = self._create_trackings(10)
+        readable = trackings.filtered(
+            lambda one: one.mail_message_id.model == "res.partner"
+        )
+        tracking_obj = self.env["mail.tracking.email"].with_user(self.user)
+        domain = [("id", "in", trackings.ids)]
+        self.assertEqual(tracking_obj.search_count(domain), 10)
+        pages = [
+            tracking_obj.search(domain, offset=offset, limit=4, order="id")
+            for offset in (0, 4, 8)
+        ]
+        self.assertEqual([len(page) for page in pages], [4, 4, 2])
+        self.assertEqual(sum(pages, tracking_obj).ids, readable.sorted("id").ids)
+        readable.with_user(self.user).read(["name"])
+        with self.assertRaises(AccessError):
+            (trackings - readable).with_user(self.user).read(["name"])
+
+    def test_search_record_rule(self):
+        hidden = self.env["res.partner"].create({"name": "Hidden partner"})
+        self.env["ir.rule"].create(
+            {
+                "name": "Hide a partner",
+                "model_id": self.env.ref("base.model_res_partner").id,
+                "groups": [(6, 0, [self.env.ref("base.group_user").id])],
+                "domain_force": repr([("id", "!=", hidden.id)]),
+            }
+        )
+        messages = self.env["mail.message"].create(
+            [
+                {
+                    "model": "res.partner",
+                    "res_id": partner.id,
+                    "message_type": "comment",
+                    "body": "<p>Message of %s</p>" % partner.name,
+                }
+                for partner in (self.recipient, hidden)
+            ]
+        )
+        trackings = self.env["mail.tracking.email"].create(
+            [
+                {
+                    "name": "Test subject",
+                    "recipient": "recipient@example.com",
+                    "mail_message_id": message.id,
+                    "state": "sent",
+                }
+                for message in messages
+            ]
+        )
+        tracking_obj = self.env["mail.tracking.email"].with_user(self.user)
+        self.assertEqual(
+            tracking_obj.search([("id", "in", trackings.ids)]), trackings[0]
+        )
+        with self.assertRaises(AccessError):
+            trackings[1].with_user(self.user).read(["name"])
+
+    def test_readable_message_query(self):
+        """The readable messages are the ones of the ORM search"""
+        hidden = self.env["res.partner"].create({"name": "Hidden partner"})
+        self.env["ir.rule"].create(
+            {
+                "name": "Hide a partner",
+                "model_id": self.env.ref("base.model_res_partner").id,
+                "groups": [(6, 0, [self.env.ref("base.group_user").id])],
+                "domain_force": repr([("id", "!=", hidden.id)]),
+            }
+        )
+        partner = self.user.partner_id
+        values = [
+            ("res.partner", self.recipient.id, {}),
+            ("res.partner", hidden.id, {}),
+            ("res.partner", hidden.id, {"author_id": partner.id}),
+            ("res.partner", hidden.id, {"partner_ids": [(4, partner.id)]}),
+            ("res.partner", self.recipient.id, {"message_type": "user_notification"}),
+            ("mail.channel", self.channel.id, {}),
+            ("mail.channel", self.channel.id, {"partner_ids": [(4, partner.id)]}),
+        ]
+        messages = self.env["mail.message"].create(
+            [
+                dict(
+                    {
+                        "model": model,
+                        "res_id": res_id,
+                        "message_type": "comment",
+                        "body": "<p>Test message</p>",
+                    },
+                    **vals
+                )
+                for model, res_id, vals in values
+            ]
+        )
+        message_obj = self.env["mail.message"].with_user(self.user)
+        query, params = message_obj._readable_message_query()
+        self.env.cr.execute(
+            "SELECT id FROM mail_message WHERE id IN ({}) AND id = ANY(%s)".format(
+                query
+            ),
+            params + [messages.ids],
+        )
+        self.assertEqual(
+            {row[0] for row in self.env.cr.fetchall()},
+            set(message_obj.search([("id", "in", messages.ids)]).ids),
+        )
+
+    def test_message_model_names_cache(self):
+        message_obj = self.env["mail.message"]
+        model_names = set(message_obj._thread_model_names()) - set(
+            message_obj._message_model_names()
+        )
+        if not model_names:
+            self.skipTest("All the thread models have messages")
+        model_name = sorted(model_names)[0]
+        message_obj.create({"model": model_name, "res_id": 1, "body": "<p>Test</p>"})
+        self.assertIn(model_name, message_obj._message_model_names())
+
+    def test_search_benchmark(self):
+        trackings = self._create_trackings(500)
+        tracking_obj = self.env["mail.tracking.email"].with_user(self.user)
+        domain = [("id", "in", trackings.ids)]
+        # Warm up caches
+        tracking_obj.search(domain, limit=80)
+        queries = self.cr.sql_log_count
+        start = time.time()
+        page = tracking_obj.search(domain, limit=80)
+        page.read(["name", "state"])
+        elapsed = time.time() - start
+        page_queries = self.cr.sql_log_count - queries
+        _logger.info(
+            "Regular user tracking list page: %.3fs (%s queries)",
+            elapsed,
+            page_queries,
+        )
+        self.assertEqual(len(page), 80)
+        self.assertLessEqual(page_queries, 10)
@@ -0,0 +1,153 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import logging
+import re
+import time
+
+import mock
+
+from odoo.tests.common import TransactionCase
+from odoo.tools import append_content_to_html, mute_logger
+
+_logger = logging.getLogger(__name__)
+
+
+class TestTrackingImg(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.tracking = self.env["mail.tracking.email"].create(
+            {"name": "Test subject", "recipient": "recipient@example.com"}
+        )
+        self.mail_server = self.env["ir.mail_server"]
+
+    def test_tracking_img_add(self):
+        email = self.tracking.tracking_img_add(
+            {"body": "<html><body><p>Test</p></body></html>"}
+        )
+        self.assertTrue(email["body"].endswith("/>\n</body></html>"))
+        self.assertEqual(
+            self.mail_server._tracking_email_id_body_get(email["body"]),
+            str(self.tracking.id),
+        )
+        # Former tracking images are replaced
+        email = self.tracking.tracking_img_add(email)
+        self.assertEqual(email["body"].count("data-odoo-tracking-email"), 1)
+        # Bodies without html structure
+        email = self.tracking.tracking_img_add({"body": "<p>Test</p>"})
+        self.assertTrue(email["body"].startswith("<p>Test</p>\n<img"))
+        self.assertFalse(self.mail_server._tracking_email_id_body_get("<p>Test</p>"))
+        # Mixed case markup
+        email = self.tracking.tracking_img_add(
+            {"body": "<HTML><Body><p>Test</p></Body></Html>"}
+        )
+        self.assertTrue(email["body"].endswith("/>\n</Body></Html>"))
+
+    def test_build_email_queue(self):
+        queue = {"<message@example.com>": (1, [self.tracking.id])}
+        mail_server = self.mail_server.with_context(mail_tracking_email_queue=queue)
+        msg = mail_server.build_email(
+            "from@example.com",
+            ["to@example.com"],
+            "Subject",
+            "<p>Test</p>",
+            message_id="<message@example.com>",
+        )
+        self.assertEqual(msg["X-Odoo-MailTracking-ID"], str(self.tracking.id))
+        self.assertEqual(queue, {"<message@example.com>": (1, [])})
+
+    def test_mail_send_queue(self):
+        mail = self.env["mail.mail"].create(
+            {
+                "subject": "Test subject",
+                "email_from": "from@domain.com",
+                "email_to": "to@example.com",
+                "body_html": "<p>This is a test message</p>",
+            }
+        )
+        with mock.patch.object(
+            type(self.mail_server), "_tracking_email_id_body_get"
+        ) as body_get:
+            mail.send()
+        body_get.assert_not_called()
+        tracking = self.env["mail.tracking.email"].search([("mail_id", "=", mail.id)])
+        self.assertEqual(tracking.state, "sent")
+
+    @mute_logger("odoo.addons.mail.models.mail_mail")
+    def test_mail_send_queue_failure(self):
+        """The tracking emails left in the queue by a mail failing to be built
+        aren't used by the next mail of the same message"""
+        partner = self.env["res.partner"].create(
+            {"name": "Recipient", "email": "recipient@example.com"}
+        )
+        vals = {
+            "subject": "Test subject",
+            "email_from": "from@domain.com",
+            "email_to": "to@example.com",
+            "recipient_ids": [(6, 0, partner.ids)],
+            "body_html": "<p>This is a test message</p>",
+            "auto_delete": False,
+        }
+        mail = self.env["mail.mail"].create(vals)
+        mails = mail | self.env["mail.mail"].create(
+            dict(vals, mail_message_id=mail.mail_message_id.id)
+        )
+        self.assertEqual(mails[0].message_id, mails[1].message_id)
+        build_email = type(self.mail_server).build_email
+        messages = []
+
+        def build_email_fail_first(server, *args, **kwargs):
+            if not messages:
+                messages.append(None)
+                raise Exception("Test error")
+            msg = build_email(server, *args, **kwargs)
+            messages.append(msg)
+            return msg
+
+        with mock.patch.object(
+            type(self.mail_server),
+            "build_email",
+            autospec=True,
+            side_effect=build_email_fail_first,
+        ):
+            mails.send()
+        self.assertEqual(mails.mapped("state"), ["exception", "sent"])
+        trackings = self.env["mail.tracking.email"].search(
+            [("mail_id", "=", mails[1].id)]
+        )
+        self.assertEqual(len(trackings), 2)
+        self.assertEqual(
+            {msg["X-Odoo-MailTracking-ID"] for msg in messages[1:]},
+            {str(tracking_id) for tracking_id in trackings.ids},
+        )
+
+    def test_tracking_img_add_benchmark(self):
+        count = 50
+        body = "<html><body>%s</body></html>" % (
+            '<p>Newsletter paragraph <img src="/web/image/1"/></p>' * 4000
+        )
+        tracking_img = self.tracking._get_mail_tracking_img()
+        start = time.time()
+        for _i in range(count):
+            content = re.sub(
+                r'<img[^>]*data-odoo-tracking-email=["\'][0-9]*["\'][^>]*>', "", body
+            )
+            content = append_content_to_html(
+                content, tracking_img, plaintext=False, container_tag="div"
+            )
+            re.search(r'<img[^>]*data-odoo-tracking-email=["\']([0-9]*)["\']', content)
+        reparse_time = time.time() - start
+        start = time.time()
+        for _i in range(count):
+            email = self.tracking.tracking_img_add({"body": body})
+            tracking_email_id = self.mail_server._tracking_email_id_body_get(
+                email["body"]
+            )
+        append_time = time.time() - start
+        _logger.info(
+            "Tracking image on a %sKB body: %.2fms with regex and reparse, "
+            "%.2fms appended",
+            len(body) // 1024,
+            reparse_time * 1000 / count,
+            append_time * 1000 / count,
+        )
+        self.assertEqual(tracking_email_id, str(self.tracking.id))
@@ -6,7 +6,7 @@
 {
     "name": "Mail tracking for Mailgun",
     "summary": "Mail tracking and Mailgun webhooks integration",
-    "version": "14.0.2.1.0",
+    "version": "14.0.2.2.0",
     "category": "Social Network",
     "website": "https://github.com/OCA/social",
     "author": "Tecnativa, Odoo Community Association (OCA)",
@@ -15,8 +15,11 @@
     "installable": True,
     "depends": ["mail_tracking"],
     "data": [
+        "security/ir.model.access.csv",
+        "data/ir_cron.xml",
         "views/res_partner.xml",
         "views/mail_tracking_email.xml",
+        "views/mail_tracking_mailgun_backfill_views.xml",
         "wizards/res_config_settings_views.xml",
     ],
 }
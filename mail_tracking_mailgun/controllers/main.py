@@ -14,6 +14,7 @@ from odoo.http import request, route
 
 from ...mail_tracking.controllers import main
 from ...web.controllers.main import ensure_db
+from ..models.mail_tracking_mailgun_token import TOKEN_MAX_AGE_MINUTES
 
 _logger = logging.getLogger(__name__)
 
@@ -26,20 +27,11 @@ class MailTrackingController(main.MailTrackingController):
         """  # noqa: E501
         # Request cannot be old
         processing_time = datetime.utcnow() - datetime.utcfromtimestamp(int(timestamp))
-        if not timedelta() < processing_time < timedelta(minutes=10):
+        if not timedelta() < processing_time < timedelta(minutes=TOKEN_MAX_AGE_MINUTES):
             raise ValidationError(_("Request is too old"))
         # Avoid replay attacks
-        try:
-            processed_tokens = (
-                request.env.registry._mail_tracking_mailgun_processed_tokens
-            )
-        except AttributeError:
-            processed_tokens = (
-                request.env.registry._mail_tracking_mailgun_processed_tokens
-            ) = set()
-        if token in processed_tokens:
+        if not request.env["mail.tracking.mailgun.token"].sudo()._token_register(token):
             raise ValidationError(_("Request was already processed"))
-        processed_tokens.add(token)
         params = request.env["mail.tracking.email"]._mailgun_values()
         # Assert signature
         if not params.webhook_signing_key:
@@ -68,6 +60,13 @@ class MailTrackingController(main.MailTrackingController):
             )
         except ValidationError as error:
             raise NotAcceptable from error
+        # Spool the event to be processed later by a cron
+        spool_obj = request.env["mail.tracking.mailgun.spool"].sudo()
+        if spool_obj._spool_enabled():
+            spool_obj.spool_event(
+                request.jsonrequest["event-data"], self._request_metadata()
+            )
+            return
         # Process event
         request.env["mail.tracking.email"].sudo()._mailgun_event_process(
             request.jsonrequest["event-data"],
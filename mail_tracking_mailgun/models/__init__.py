@@ -4,3 +4,7 @@ from . import ir_mail_server
 from . import mail_tracking_email
 from . import mail_tracking_event
 from . import res_partner
+from . import mail_tracking_mailgun_spool
+from . import mail_tracking_mailgun_token
+from . import mail_tracking_mailgun_backfill
+from . import res_country
@@ -4,13 +4,19 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 import logging
+import threading
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from urllib.parse import urljoin
 
+import psycopg2
+import psycopg2.errorcodes
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from odoo import _, api, fields, models
+from odoo import _, api, fields, models, tools
 from odoo.exceptions import UserError, ValidationError
 from odoo.tools import email_split
 
@@ -29,6 +35,52 @@ MailgunParameters = namedtuple(
 )
 
 
+# Shared Mailgun API client settings
+MAILGUN_TIMEOUT = 10  # seconds
+MAILGUN_MAX_WORKERS = 8
+MAILGUN_RETRIES = 3
+MAILGUN_RETRY_BACKOFF = 0.5  # seconds, doubled on each retry
+
+_mailgun_session = None
+_mailgun_session_lock = threading.Lock()
+
+
+def mailgun_session():
+    """Keep-alive HTTP session shared by all the Mailgun API calls of the
+    process. Throttled or unavailable responses are retried with backoff."""
+    global _mailgun_session
+    with _mailgun_session_lock:
+        if _mailgun_session is None:
+            retry = Retry(
+                total=MAILGUN_RETRIES,
+                backoff_factor=MAILGUN_RETRY_BACKOFF,
+                status_forcelist=(429, 502, 503, 504),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=MAILGUN_MAX_WORKERS,
+                pool_maxsize=MAILGUN_MAX_WORKERS,
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _mailgun_session = session
+        return _mailgun_session
+
+
+# Tracking event metadata: Mailgun event field
+MAILGUN_METADATA_MAPPING = {
+    "recipient": "recipient",
+    "ip": "ip",
+    "user_agent": "user-agent",
+    "os_family": "client-os",
+    "ua_family": "client-name",
+    "ua_type": "client-type",
+    "url": "url",
+}
+
+
 class EventNotFoundWarning(Warning):
     pass
 
@@ -36,15 +88,22 @@ class EventNotFoundWarning(Warning):
 class MailTrackingEmail(models.Model):
     _inherit = "mail.tracking.email"
 
+    @api.model
+    @tools.ormcache()
+    def _country_ids_by_code(self):
+        """Country ids indexed by their code, shared by all the events and
+        invalidated when countries are changed"""
+        return {
+            country["code"]: country["id"]
+            for country in self.env["res.country"]
+            .sudo()
+            .search_read([("code", "!=", False)], ["code"])
+        }
+
     def _country_search(self, country_code):
-        country = False
-        if country_code:
-            country = self.env["res.country"].search(
-                [("code", "=", country_code.upper())]
-            )
-        if country:
-            return country.id
-        return False
+        if not country_code:
+            return False
+        return self._country_ids_by_code().get(country_code.upper(), False)
 
     @api.model
     def _mailgun_event2type(self, event, default="UNKNOWN"):
@@ -93,6 +152,37 @@ class MailTrackingEmail(models.Model):
             webhook_signing_key,
         )
 
+    @api.model
+    def _mailgun_request(self, method, url, **kwargs):
+        """Call the Mailgun API through the shared session"""
+        kwargs.setdefault("timeout", MAILGUN_TIMEOUT)
+        return getattr(mailgun_session(), method)(url, **kwargs)
+
+    @api.model
+    def _mailgun_requests_batch(self, method, calls):
+        """Call the Mailgun API concurrently, with a bounded number of threads.
+
+        :param calls: list of dictionaries with the ``url`` and the rest of
+            keyword arguments of each request.
+        :return: list with the response of each call, in the same order, or
+            the raised exception when the request failed.
+        """
+
+        def _request(call):
+            call = dict(call)
+            try:
+                return self._mailgun_request(method, call.pop("url"), **call)
+            except requests.RequestException as error:
+                return error
+
+        # The threads only perform HTTP requests, never touch the environment
+        if len(calls) <= 1:
+            return [_request(call) for call in calls]
+        with ThreadPoolExecutor(
+            max_workers=min(MAILGUN_MAX_WORKERS, len(calls))
+        ) as executor:
+            return list(executor.map(_request, calls))
+
     def _mailgun_metadata(self, mailgun_event_type, event, metadata):
         # Get Mailgun timestamp when found
         ts = event.get("timestamp", False)
@@ -111,16 +201,7 @@ class MailTrackingEmail(models.Model):
                 }
             )
         # Common field mapping
-        mapping = {
-            "recipient": "recipient",
-            "ip": "ip",
-            "user_agent": "user-agent",
-            "os_family": "client-os",
-            "ua_family": "client-name",
-            "ua_type": "client-type",
-            "url": "url",
-        }
-        for k, v in mapping.items():
+        for k, v in MAILGUN_METADATA_MAPPING.items():
             if event.get(v, False):
                 metadata[k] = event[v]
         # Special field mapping
@@ -168,15 +249,28 @@ class MailTrackingEmail(models.Model):
         """
         if event_data["user-variables"]["odoo_db"] != self.env.cr.dbname:
             raise ValidationError(_("Wrong database for event!"))
-        # Do nothing if event was already processed
-        mailgun_id = event_data["id"]
-        db_event = self.env["mail.tracking.event"].search(
-            [("mailgun_id", "=", mailgun_id)], limit=1
+        metadata = self._mailgun_metadata(event_data["event"], event_data, metadata)
+        return self._mailgun_event_import(event_data, metadata)
+
+    @api.model
+    def _mailgun_duplicate_event_error(self, error):
+        """Whether the error was raised by the insertion of an event already
+        imported. The savepoint must be rolled back then."""
+        return (
+            isinstance(error, psycopg2.IntegrityError)
+            and error.pgcode == psycopg2.errorcodes.UNIQUE_VIOLATION
+            and error.diag.constraint_name == "mail_tracking_event_mailgun_id_unique"
         )
-        if db_event:
-            _logger.debug("Mailgun event already found in DB: %s", mailgun_id)
-            return db_event
-        # Do nothing if tracking email for event is not found
+
+    @api.model
+    def _mailgun_event_import(self, event_data, metadata):
+        """Create the tracking event of a Mailgun event, with its metadata
+        already mapped.
+
+        The event is inserted optimistically in a savepoint, an event already
+        imported is detected by the violation of the unique Mailgun ID.
+        """
+        mailgun_id = event_data["id"]
         message_id = event_data["message"]["headers"]["message-id"]
         recipient = event_data["recipient"]
         tracking_email = self.browse(
@@ -185,7 +279,6 @@ class MailTrackingEmail(models.Model):
         mailgun_event_type = event_data["event"]
         # Process event
         state = self._mailgun_event2type(event_data, mailgun_event_type)
-        metadata = self._mailgun_metadata(mailgun_event_type, event_data, metadata)
         _logger.info(
             "Importing mailgun event %s (%s message %s for %s)",
             mailgun_id,
@@ -193,7 +286,62 @@ class MailTrackingEmail(models.Model):
             message_id,
             recipient,
         )
-        tracking_email.event_create(state, metadata)
+        try:
+            with self.env.cr.savepoint():
+                return tracking_email.event_create(state, metadata)
+        except psycopg2.IntegrityError as error:
+            if not self._mailgun_duplicate_event_error(error):
+                raise
+            _logger.debug("Mailgun event already found in DB: %s", mailgun_id)
+            return self.env["mail.tracking.event"]
+
+    @api.model
+    def _mailgun_events_process(self, events):
+        """Process a batch of events obtained from the Mailgun Events API.
+
+        Events of other databases, of unknown tracking emails or already
+        imported are skipped. Each event is imported in its own savepoint, so
+        a failing event doesn't abort the whole batch.
+
+        :return: number of imported events
+        """
+        dbname = self.env.cr.dbname
+        events = [
+            event
+            for event in events
+            if event.get("user-variables", {}).get("odoo_db") == dbname
+            and event["user-variables"].get("tracking_email_id")
+        ]
+        self.env["mail.tracking.event"].flush(["mailgun_id"])
+        self.env.cr.execute(
+            "SELECT mailgun_id FROM mail_tracking_event WHERE mailgun_id = ANY(%s)",
+            ([event.get("id") for event in events],),
+        )
+        known_ids = {row[0] for row in self.env.cr.fetchall()}
+        tracking_ids = set(
+            self.browse(
+                {int(event["user-variables"]["tracking_email_id"]) for event in events}
+            )
+            .exists()
+            .ids
+        )
+        events = [
+            event
+            for event in events
+            if event.get("id") not in known_ids
+            and int(event["user-variables"]["tracking_email_id"]) in tracking_ids
+        ]
+        imported = 0
+        for event in events:
+            try:
+                metadata = self._mailgun_metadata(event["event"], event, {})
+                if self._mailgun_event_import(event, metadata):
+                    imported += 1
+            except Exception:
+                _logger.warning(
+                    "Failed to import Mailgun event %s", event.get("id"), exc_info=True
+                )
+        return imported
 
     def action_manual_check_mailgun(self):
         """Manual check against Mailgun API
@@ -213,7 +361,8 @@ class MailTrackingEmail(models.Model):
                 "recipient": email_split(tracking.recipient)[0],
             }
             while url:
-                res = requests.get(
+                res = self._mailgun_request(
+                    "get",
                     url,
                     auth=("api", api_key),
                     params=params,
@@ -229,5 +378,4 @@ class MailTrackingEmail(models.Model):
                 url = res.json().get("paging", {}).get("next")
             if not events:
                 raise UserError(_("Event information not longer stored"))
-            for event in events:
-                self.sudo()._mailgun_event_process(event, {})
+            self.sudo()._mailgun_events_process(events)
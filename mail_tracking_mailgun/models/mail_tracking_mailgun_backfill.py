@@ -0,0 +1,154 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import calendar
+import logging
+import threading
+import time
+from urllib.parse import urlencode, urljoin
+
+import requests
+
+from odoo import _, api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Maximum number of events per page allowed by the Mailgun Events API
+BACKFILL_PAGE_LIMIT = 300
+BACKFILL_REQUEST_TIMEOUT = 30  # seconds
+
+
+class MailTrackingMailgunBackfill(models.Model):
+    """Reconciliation of the tracking emails with the events stored by Mailgun.
+
+    The whole domain events of a time window are paged through the Mailgun
+    Events API and imported in batches. The next page to fetch is stored after
+    each page, so an interrupted backfill resumes where it stopped, and events
+    already imported are skipped thanks to their unique Mailgun ID.
+    """
+
+    _name = "mail.tracking.mailgun.backfill"
+    _description = "Mailgun events backfill"
+    _order = "id desc"
+
+    date_begin = fields.Datetime(
+        string="From",
+        required=True,
+        readonly=True,
+        states={"pending": [("readonly", False)]},
+    )
+    date_end = fields.Datetime(
+        string="To",
+        required=True,
+        readonly=True,
+        states={"pending": [("readonly", False)]},
+    )
+    state = fields.Selection(
+        [("pending", "Pending"), ("done", "Done"), ("error", "Error")],
+        required=True,
+        readonly=True,
+        default="pending",
+        copy=False,
+    )
+    next_url = fields.Char(
+        readonly=True,
+        copy=False,
+        help="Next page to fetch, used to resume the backfill",
+    )
+    page_count = fields.Integer(string="Pages", readonly=True, copy=False)
+    event_count = fields.Integer(string="Events", readonly=True, copy=False)
+    imported_count = fields.Integer(string="Imported events", readonly=True, copy=False)
+    error = fields.Text(readonly=True, copy=False)
+
+    def _backfill_first_url(self):
+        self.ensure_one()
+        params = self.env["mail.tracking.email"]._mailgun_values()
+        url = urljoin(params.api_url, "/v3/%s/events" % params.domain)
+        return "{}?{}".format(
+            url,
+            urlencode(
+                {
+                    "begin": calendar.timegm(self.date_begin.timetuple()),
+                    "end": calendar.timegm(self.date_end.timetuple()),
+                    "ascending": "yes",
+                    "limit": BACKFILL_PAGE_LIMIT,
+                }
+            ),
+        )
+
+    def _backfill_run(self, auth, deadline):
+        """Import the pages of events until the time window is consumed or the
+        deadline is reached, committing after each page"""
+        self.ensure_one()
+        tracking_email_obj = self.env["mail.tracking.email"].sudo()
+        auto_commit = not getattr(threading.currentThread(), "testing", False)
+        url = self.next_url or self._backfill_first_url()
+        while url and time.time() < deadline:
+            response = tracking_email_obj._mailgun_request(
+                "get", url, auth=auth, timeout=BACKFILL_REQUEST_TIMEOUT
+            )
+            if response.status_code != 200:
+                self.write(
+                    {
+                        "state": "error",
+                        "next_url": url,
+                        "error": _("Error %s retrieving Mailgun events: %s")
+                        % (response.status_code, response.text),
+                    }
+                )
+                return False
+            content = response.json()
+            items = content.get("items", [])
+            if not items:
+                url = False
+                break
+            imported = tracking_email_obj._mailgun_events_process(items)
+            url = content.get("paging", {}).get("next")
+            self.write(
+                {
+                    "next_url": url,
+                    "page_count": self.page_count + 1,
+                    "event_count": self.event_count + len(items),
+                    "imported_count": self.imported_count + imported,
+                }
+            )
+            if auto_commit:
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+        if not url:
+            self.write({"state": "done", "next_url": False, "error": False})
+        return True
+
+    def _backfill_process(self, time_budget=240):
+        """Run the pending backfills through the shared Mailgun API session"""
+        auth = ("api", self.env["mail.tracking.email"]._mailgun_values().api_key)
+        deadline = time.time() + time_budget
+        for backfill in self.filtered(lambda x: x.state == "pending"):
+            if time.time() >= deadline:
+                break
+            try:
+                backfill._backfill_run(auth, deadline)
+            except requests.RequestException as error:
+                backfill.write({"state": "error", "error": str(error)})
+            _logger.info(
+                "Mailgun backfill %s: %s pages, %s events, %s imported (%s)",
+                backfill.id,
+                backfill.page_count,
+                backfill.event_count,
+                backfill.imported_count,
+                backfill.state,
+            )
+        return True
+
+    def action_backfill_run(self):
+        return self._backfill_process()
+
+    def action_backfill_resume(self):
+        """Retry failed backfills from their last checkpoint"""
+        self.filtered(lambda x: x.state == "error").write(
+            {"state": "pending", "error": False}
+        )
+
+    @api.model
+    def _cron_backfill_process(self, time_budget=240):
+        return self.search([("state", "=", "pending")], order="id")._backfill_process(
+            time_budget=time_budget
+        )
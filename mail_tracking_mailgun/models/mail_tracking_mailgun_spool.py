@@ -0,0 +1,180 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import json
+import logging
+import threading
+import time
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+SPOOL_MAX_ATTEMPTS = 5
+SPOOL_DEAD_RETENTION_DAYS = 30
+
+
+class MailTrackingMailgunSpool(models.Model):
+    """Raw Mailgun webhook payloads waiting to be processed.
+
+    When ``mailgun.webhook_async`` is enabled the webhook controller only
+    verifies the request and stores it here, and a cron drains the spool through
+    ``mail.tracking.email._mailgun_event_process``. Events still failing after
+    ``SPOOL_MAX_ATTEMPTS`` attempts are marked as dead and kept for inspection
+    until the autovacuum deletes them.
+    """
+
+    _name = "mail.tracking.mailgun.spool"
+    _description = "Mailgun webhook events spool"
+    _order = "id"
+
+    event_data = fields.Text(required=True, readonly=True)
+    metadata = fields.Text(readonly=True)
+    attempts = fields.Integer(readonly=True, default=0)
+    error = fields.Text(readonly=True)
+    state = fields.Selection(
+        [("pending", "Pending"), ("dead", "Dead")],
+        required=True,
+        readonly=True,
+        default="pending",
+        index=True,
+    )
+
+    @api.model
+    def _spool_enabled(self):
+        return bool(
+            self.env["ir.config_parameter"].sudo().get_param("mailgun.webhook_async")
+        )
+
+    @api.model
+    def _spool_batch_size(self):
+        try:
+            return int(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param("mailgun.spool_batch_size", 500)
+            )
+        except ValueError:
+            return 500
+
+    @api.model
+    def spool_event(self, event_data, metadata):
+        """Append a webhook payload to the spool"""
+        return self.sudo().create(
+            {
+                "event_data": json.dumps(event_data),
+                "metadata": json.dumps(metadata, default=str),
+            }
+        )
+
+    @api.model
+    def spool_metrics(self):
+        """Queue depth and lag (in seconds) of the pending spooled events, and
+        number of dead ones"""
+        self.flush()
+        self.env.cr.execute(
+            """
+            SELECT
+                COUNT(*) FILTER (WHERE state = 'pending'),
+                EXTRACT(
+                    EPOCH FROM NOW() AT TIME ZONE 'UTC'
+                    - MIN(create_date) FILTER (WHERE state = 'pending')
+                ),
+                COUNT(*) FILTER (WHERE state = 'dead')
+            FROM mail_tracking_mailgun_spool
+            """
+        )
+        depth, lag, dead = self.env.cr.fetchone()
+        return {"depth": depth, "lag": int(lag or 0), "dead": dead}
+
+    def _spool_process(self):
+        """Process the spooled events, keeping the failed ones for a retry
+        until they reach ``SPOOL_MAX_ATTEMPTS``"""
+        tracking_email_obj = self.env["mail.tracking.email"].sudo()
+        processed = self.browse()
+        for spooled in self:
+            try:
+                with self.env.cr.savepoint():
+                    tracking_email_obj._mailgun_event_process(
+                        json.loads(spooled.event_data),
+                        json.loads(spooled.metadata or "{}"),
+                    )
+                processed |= spooled
+            except Exception as error:
+                attempts = spooled.attempts + 1
+                vals = {"attempts": attempts, "error": str(error)}
+                if attempts >= SPOOL_MAX_ATTEMPTS:
+                    vals["state"] = "dead"
+                    _logger.error(
+                        "Giving up spooled Mailgun event %s after %s attempts",
+                        spooled.id,
+                        attempts,
+                    )
+                else:
+                    _logger.warning(
+                        "Failed to process spooled Mailgun event %s", spooled.id
+                    )
+                spooled.write(vals)
+        processed.unlink()
+        return processed
+
+    @api.model
+    def _cron_spool_process(self, batch_size=None, time_budget=240):
+        """Drain the spool in batches until it is empty or the time budget
+        (in seconds) is consumed"""
+        batch_size = batch_size or self._spool_batch_size()
+        auto_commit = not getattr(threading.currentThread(), "testing", False)
+        start = time.time()
+        total = last_id = 0
+        while time.time() - start < time_budget:
+            # Skip locked rows to allow several workers draining the spool
+            self.env.cr.execute(
+                """
+                SELECT id FROM mail_tracking_mailgun_spool
+                WHERE state = 'pending' AND id > %s
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+                """,
+                (last_id, batch_size),
+            )
+            ids = [row[0] for row in self.env.cr.fetchall()]
+            if not ids:
+                break
+            last_id = ids[-1]
+            total += len(self.browse(ids)._spool_process())
+            if auto_commit:
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+        metrics = self.spool_metrics()
+        _logger.info(
+            "Processed %s spooled Mailgun events. Queue depth: %s. Lag: %ss. "
+            "Dead: %s",
+            total,
+            metrics["depth"],
+            metrics["lag"],
+            metrics["dead"],
+        )
+        return total
+
+    @api.autovacuum
+    def _gc_mail_tracking_mailgun_spool(self):
+        """Delete the dead spooled events older than the retention period"""
+        try:
+            retention_days = int(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param(
+                    "mailgun.spool_dead_retention_days", SPOOL_DEAD_RETENTION_DAYS
+                )
+            )
+        except ValueError:
+            retention_days = SPOOL_DEAD_RETENTION_DAYS
+        self.flush()
+        self.env.cr.execute(
+            """
+            DELETE FROM mail_tracking_mailgun_spool
+            WHERE state = 'dead'
+                AND write_date < NOW() AT TIME ZONE 'UTC' - make_interval(days => %s)
+            """,
+            (retention_days,),
+        )
+        _logger.info("Deleted %s dead spooled Mailgun events", self.env.cr.rowcount)
@@ -0,0 +1,58 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Mailgun webhooks older than this are rejected, so their tokens can be forgotten
+TOKEN_MAX_AGE_MINUTES = 10
+
+
+class MailTrackingMailgunToken(models.Model):
+    """Tokens of the already processed Mailgun webhooks, shared by all the
+    workers to avoid replay attacks"""
+
+    _name = "mail.tracking.mailgun.token"
+    _description = "Mailgun webhook processed token"
+    _log_access = False
+
+    _sql_constraints = [
+        ("token_unique", "UNIQUE(token)", "Mailgun webhook tokens must be unique!")
+    ]
+
+    token = fields.Char(required=True, readonly=True)
+    date = fields.Datetime(required=True, readonly=True, index=True)
+
+    @api.model
+    def _token_register(self, token):
+        """Register a webhook token as processed.
+
+        Return ``False`` when the token was already registered. The token is
+        registered within the current transaction, so a failed request can be
+        retried by Mailgun.
+        """
+        self.env.cr.execute(
+            """
+            INSERT INTO mail_tracking_mailgun_token (token, date)
+            VALUES (%s, NOW() AT TIME ZONE 'UTC')
+            ON CONFLICT (token) DO NOTHING
+            RETURNING id
+            """,
+            (token,),
+        )
+        return bool(self.env.cr.fetchone())
+
+    @api.model
+    def _cron_token_purge(self):
+        """Forget tokens of webhooks that would be rejected for being too old.
+        Run as often as tokens expire, to keep the table small."""
+        self.env.cr.execute(
+            """
+            DELETE FROM mail_tracking_mailgun_token
+            WHERE date < NOW() AT TIME ZONE 'UTC' - make_interval(mins => %s)
+            """,
+            (TOKEN_MAX_AGE_MINUTES,),
+        )
+        _logger.info("Deleted %s expired Mailgun webhook tokens", self.env.cr.rowcount)
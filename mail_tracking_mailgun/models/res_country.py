@@ -0,0 +1,24 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+
+class ResCountry(models.Model):
+    _inherit = "res.country"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        res = super().create(vals_list)
+        self.env["mail.tracking.email"].clear_caches()
+        return res
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "code" in vals:
+            self.env["mail.tracking.email"].clear_caches()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env["mail.tracking.email"].clear_caches()
+        return res
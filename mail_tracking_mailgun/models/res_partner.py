@@ -4,27 +4,44 @@
 # Copyright 2017 Tecnativa - David Vidal
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+import logging
 from urllib.parse import urljoin
 
-import requests
-
-from odoo import _, api, models
+from odoo import _, api, fields, models
 from odoo.exceptions import UserError
 
+_logger = logging.getLogger(__name__)
+
 
 class ResPartner(models.Model):
     _inherit = "res.partner"
 
+    mailgun_auto_check_pending = fields.Boolean(
+        string="Mailgun check pending",
+        readonly=True,
+        copy=False,
+        index=True,
+        help="The email will be checked by the Mailgun auto check scheduled action",
+    )
+
     def email_bounced_set(self, tracking_emails, reason, event=None):
         res = super().email_bounced_set(tracking_emails, reason, event=event)
         self._email_bounced_set(reason, event)
         return res
 
     def _email_bounced_set(self, reason, event):
+        """Log the bounce in the chatter of the partners. ``event`` can hold
+        the events of several partners, the one of each partner is linked."""
+        events = event or self.env["mail.tracking.event"]
+        bodies = {}
         for partner in self:
             if not partner.email:
                 continue
-            event = event or self.env["mail.tracking.event"]
+            email = partner.email.lower()
+            event = (
+                events.filtered(lambda x, e=email: x.recipient_address == e)[:1]
+                or events[:1]
+            )
             event_str = """
                 <a href="#"
                    data-oe-model="mail.tracking.event" data-oe-id="%d">%s</a>
@@ -32,12 +49,16 @@ class ResPartner(models.Model):
                 event.id or 0,
                 event.id or _("unknown"),
             )
-            body = _("Email has been bounced: %s\nReason: %s\nEvent: %s") % (
+            bodies[partner.id] = _(
+                "Email has been bounced: %s\nReason: %s\nEvent: %s"
+            ) % (
                 partner.email,
                 reason,
                 event_str,
             )
-            partner.message_post(body=body)
+        if bodies:
+            # A single insert for all the chatter notes
+            self.browse(list(bodies))._message_log_batch(bodies)
 
     def check_email_validity(self):
         """
@@ -45,7 +66,13 @@ class ResPartner(models.Model):
         API documentation:
         https://documentation.mailgun.com/en/latest/api-email-validation.html
         """
-        params = self.env["mail.tracking.email"]._mailgun_values()
+        self._check_email_validity()
+
+    def _check_email_validity(self):
+        """Check the mailbox validity, return the partners for which Mailgun
+        returned a validation result"""
+        tracking_email_obj = self.env["mail.tracking.email"]
+        params = tracking_email_obj._mailgun_values()
         if not params.validation_key:
             raise UserError(
                 _(
@@ -53,22 +80,31 @@ class ResPartner(models.Model):
                     " in order to be able to check mails validity"
                 )
             )
-        for partner in self.filtered("email"):
-            res = requests.get(
-                urljoin(params.api_url, "/v3/address/validate"),
-                auth=("api", params.validation_key),
-                params={"address": partner.email, "mailbox_verification": True},
-            )
-            if (
-                not res
-                or res.status_code != 200
-                and not self.env.context.get("mailgun_auto_check")
-            ):
+        partners = self.filtered("email")
+        checked = self.browse()
+        responses = tracking_email_obj._mailgun_requests_batch(
+            "get",
+            [
+                {
+                    "url": urljoin(params.api_url, "/v3/address/validate"),
+                    "auth": ("api", params.validation_key),
+                    "params": {
+                        "address": partner.email,
+                        "mailbox_verification": True,
+                    },
+                }
+                for partner in partners
+            ],
+        )
+        for partner, res in zip(partners, responses):
+            failed = isinstance(res, Exception)
+            if failed or not res or res.status_code != 200:
+                if self.env.context.get("mailgun_auto_check"):
+                    # Don't block the automatic checks of the other partners
+                    continue
                 raise UserError(
-                    _(
-                        "Error %s trying to check mail" % res.status_code
-                        or "of connection"
-                    )
+                    _("Error %s trying to check mail")
+                    % ("of connection" if failed else res.status_code)
                 )
             content = res.json()
             if "mailbox_verification" not in content:
@@ -79,6 +115,8 @@ class ResPartner(models.Model):
                             " returned"
                         )
                     )
+                continue
+            checked |= partner
             # Not a valid address: API sets 'is_valid' as False
             # and 'mailbox_verification' as None
             if not content["is_valid"]:
@@ -119,6 +157,7 @@ class ResPartner(models.Model):
                         )
                         % (partner.email)
                     )
+        return checked
 
     def check_email_bounced(self):
         """
@@ -126,18 +165,30 @@ class ResPartner(models.Model):
         API documentation:
         https://documentation.mailgun.com/en/latest/api-suppressions.html
         """
-        api_key, api_url, domain, *__ = self.env[
-            "mail.tracking.email"
-        ]._mailgun_values()
-        for partner in self:
-            res = requests.get(
-                urljoin(api_url, "/v3/%s/bounces/%s" % (domain, partner.email)),
-                auth=("api", api_key),
-            )
+        tracking_email_obj = self.env["mail.tracking.email"]
+        api_key, api_url, domain, *__ = tracking_email_obj._mailgun_values()
+        responses = tracking_email_obj._mailgun_requests_batch(
+            "get",
+            [
+                {
+                    "url": urljoin(
+                        api_url, "/v3/%s/bounces/%s" % (domain, partner.email)
+                    ),
+                    "auth": ("api", api_key),
+                }
+                for partner in self
+            ],
+        )
+        bounced = not_bounced = self.browse()
+        for partner, res in zip(self, responses):
+            if isinstance(res, Exception):
+                continue
             if res.status_code == 200 and not partner.email_bounced:
-                partner.email_bounced = True
+                bounced |= partner
             elif res.status_code == 404 and partner.email_bounced:
-                partner.email_bounced = False
+                not_bounced |= partner
+        bounced.write({"email_bounced": True})
+        not_bounced.write({"email_bounced": False})
 
     def force_set_bounced(self):
         """
@@ -145,16 +196,25 @@ class ResPartner(models.Model):
         API documentation:
         https://documentation.mailgun.com/en/latest/api-suppressions.html
         """
-        api_key, api_url, domain, *__ = self.env[
-            "mail.tracking.email"
-        ]._mailgun_values()
-        for partner in self:
-            res = requests.post(
-                urljoin(api_url, "/v3/%s/bounces" % domain),
-                auth=("api", api_key),
-                data={"address": partner.email},
+        tracking_email_obj = self.env["mail.tracking.email"]
+        api_key, api_url, domain, *__ = tracking_email_obj._mailgun_values()
+        responses = tracking_email_obj._mailgun_requests_batch(
+            "post",
+            [
+                {
+                    "url": urljoin(api_url, "/v3/%s/bounces" % domain),
+                    "auth": ("api", api_key),
+                    "data": {"address": partner.email},
+                }
+                for partner in self
+            ],
+        )
+        for partner, res in zip(self, responses):
+            partner.email_bounced = (
+                not isinstance(res, Exception)
+                and res.status_code == 200
+                and not partner.email_bounced
             )
-            partner.email_bounced = res.status_code == 200 and not partner.email_bounced
 
     def force_unset_bounced(self):
         """
@@ -162,32 +222,71 @@ class ResPartner(models.Model):
         API documentation:
         https://documentation.mailgun.com/en/latest/api-suppressions.html
         """
-        api_key, api_url, domain, *__ = self.env[
-            "mail.tracking.email"
-        ]._mailgun_values()
-        for partner in self:
-            res = requests.delete(
-                urljoin(api_url, "/v3/%s/bounces/%s" % (domain, partner.email)),
-                auth=("api", api_key),
-            )
+        tracking_email_obj = self.env["mail.tracking.email"]
+        api_key, api_url, domain, *__ = tracking_email_obj._mailgun_values()
+        responses = tracking_email_obj._mailgun_requests_batch(
+            "delete",
+            [
+                {
+                    "url": urljoin(
+                        api_url, "/v3/%s/bounces/%s" % (domain, partner.email)
+                    ),
+                    "auth": ("api", api_key),
+                }
+                for partner in self
+            ],
+        )
+        not_bounced = self.browse()
+        for partner, res in zip(self, responses):
+            if isinstance(res, Exception):
+                continue
             if res.status_code in (200, 404) and partner.email_bounced:
-                partner.email_bounced = False
+                not_bounced |= partner
+        not_bounced.write({"email_bounced": False})
 
     def _autocheck_partner_email(self):
-        for partner in self:
-            partner.with_context(mailgun_auto_check=True).check_email_validity()
+        """Check the partner emails without raising, return the partners for
+        which Mailgun returned a validation result"""
+        return self.with_context(mailgun_auto_check=True)._check_email_validity()
 
     @api.model
-    def create(self, vals):
-        if "email" in vals and self.env["ir.config_parameter"].sudo().get_param(
-            "mailgun.auto_check_partner_email"
-        ):
-            self._autocheck_partner_email()
-        return super().create(vals)
+    def _cron_mailgun_autocheck_partner_email(self, limit=1000):
+        """Check the emails of the partners created or modified since the last
+        run, out of the transaction that changed them"""
+        icp = self.env["ir.config_parameter"].sudo()
+        if not icp.get_param("mailgun.validation_key"):
+            _logger.warning(
+                "Skipping the Mailgun partner emails auto check. "
+                "Set `mailgun.validation_key` config parameter to enable"
+            )
+            return False
+        partners = self.search([("mailgun_auto_check_pending", "=", True)], limit=limit)
+        if partners:
+            # Partners whose check failed, e.g. on a Mailgun outage, are kept
+            # pending for the next run
+            checked = partners._autocheck_partner_email()
+            (checked | partners.filtered(lambda p: not p.email)).write(
+                {"mailgun_auto_check_pending": False}
+            )
+        return True
+
+    @api.model
+    def _mailgun_auto_check_enabled(self):
+        return bool(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("mailgun.auto_check_partner_email")
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        if self._mailgun_auto_check_enabled():
+            for vals in vals_list:
+                if vals.get("email"):
+                    vals["mailgun_auto_check_pending"] = True
+        return super().create(vals_list)
 
     def write(self, vals):
-        if "email" in vals and self.env["ir.config_parameter"].sudo().get_param(
-            "mailgun.auto_check_partner_email"
-        ):
-            self._autocheck_partner_email()
+        if vals.get("email") and self._mailgun_auto_check_enabled():
+            vals = dict(vals, mailgun_auto_check_pending=True)
         return super().write(vals)
@@ -3,9 +3,10 @@
 # Copyright 2021 Tecnativa - Jairo Llopis
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from contextlib import contextmanager, suppress
+from contextlib import contextmanager
 
 import mock
+import requests
 from freezegun import freeze_time
 from werkzeug.exceptions import NotAcceptable
 
@@ -14,6 +15,7 @@ from odoo.tests.common import Form, TransactionCase
 from odoo.tools import mute_logger
 
 from ..controllers.main import MailTrackingController
+from ..models.mail_tracking_mailgun_spool import SPOOL_MAX_ATTEMPTS
 
 # HACK https://github.com/odoo/odoo/pull/78424 because website is not dependency
 try:
@@ -106,8 +108,7 @@ class TestMailgun(TransactionCase):
         if MockRequest is None:
             self.skipTest("MockRequest not found, sorry")
         if reset_replay_cache:
-            with suppress(AttributeError):
-                del self.env.registry._mail_tracking_mailgun_processed_tokens
+            self.env["mail.tracking.mailgun.token"].search([]).unlink()
         # Imitate Mailgun JSON request
         mock = MockRequest(self.env)
         with mock as request:
@@ -153,6 +154,25 @@ class TestMailgun(TransactionCase):
         with self._request_mock(), self.assertRaises(NotAcceptable):
             self.MailTrackingController.mail_tracking_mailgun_webhook()
 
+    def test_replayed_webhook(self):
+        with self._request_mock():
+            self.MailTrackingController.mail_tracking_mailgun_webhook()
+        with self._request_mock(reset_replay_cache=False), self.assertRaises(
+            NotAcceptable
+        ):
+            self.MailTrackingController.mail_tracking_mailgun_webhook()
+        token_obj = self.env["mail.tracking.mailgun.token"]
+        token = token_obj.search([("token", "=", self.token)])
+        self.assertTrue(token)
+        token_obj._cron_token_purge()
+        self.assertTrue(token.exists())
+        self.env.cr.execute(
+            "UPDATE mail_tracking_mailgun_token SET date = date - interval '1 hour'"
+        )
+        token_obj._cron_token_purge()
+        token.invalidate_cache()
+        self.assertFalse(token.exists())
+
     @mute_logger("odoo.addons.mail_tracking_mailgun.models.mail_tracking_email")
     def test_bad_event_type(self):
         old_events = self.tracking_email.tracking_event_ids
@@ -207,6 +227,25 @@ class TestMailgun(TransactionCase):
             self.assertEqual(event.timestamp, float(self.timestamp))
             self.assertEqual(event.recipient, self.recipient)
 
+    @mute_logger("odoo.sql_db")
+    def test_event_delivered_duplicate(self):
+        self.event.update({"event": "delivered"})
+        # Mailgun delivers the same event twice
+        for _i in range(2):
+            with self._request_mock():
+                self.MailTrackingController.mail_tracking_mailgun_webhook()
+        self.assertEqual(len(self.event_search("delivered")), 1)
+
+    def test_event_import_duplicate(self):
+        self.event.update({"event": "delivered"})
+        tracking_email_obj = self.env["mail.tracking.email"]
+        self.assertTrue(tracking_email_obj._mailgun_event_process(self.event, {}))
+        # Imported again, e.g. by a concurrent webhook call
+        with mute_logger("odoo.sql_db"):
+            events = tracking_email_obj._mailgun_event_process(self.event, {})
+        self.assertFalse(events)
+        self.assertEqual(len(self.event_search("delivered")), 1)
+
     # https://documentation.mailgun.com/en/latest/user_manual.html#tracking-opens
     def test_event_opened(self):
         ip = "127.0.0.1"
@@ -368,8 +407,120 @@ class TestMailgun(TransactionCase):
         self.assertEqual(event.error_description, reason)
         self.assertEqual(event.error_details, description)
 
-    @mock.patch(_packagepath + ".models.res_partner.requests")
-    def test_email_validity(self, mock_request):
+    def test_event_spooled(self):
+        self.env["ir.config_parameter"].set_param("mailgun.webhook_async", "True")
+        spool_obj = self.env["mail.tracking.mailgun.spool"]
+        with self._request_mock():
+            self.MailTrackingController.mail_tracking_mailgun_webhook()
+        self.assertFalse(
+            self.env["mail.tracking.event"].search(
+                [("mailgun_id", "=", self.event["id"])]
+            )
+        )
+        self.assertEqual(spool_obj.spool_metrics()["depth"], 1)
+        self.assertEqual(spool_obj._cron_spool_process(), 1)
+        self.assertEqual(spool_obj.spool_metrics()["depth"], 0)
+        self.event_search("delivered")
+
+    @mute_logger("odoo.sql_db")
+    def test_event_spooled_duplicate(self):
+        self.env["ir.config_parameter"].set_param("mailgun.webhook_async", "True")
+        spool_obj = self.env["mail.tracking.mailgun.spool"]
+        # Mailgun delivers the same event twice
+        for _i in range(2):
+            with self._request_mock():
+                self.MailTrackingController.mail_tracking_mailgun_webhook()
+        self.assertEqual(spool_obj._cron_spool_process(), 2)
+        self.assertEqual(spool_obj.spool_metrics()["depth"], 0)
+        self.assertEqual(len(self.event_search("delivered")), 1)
+
+    def test_events_process_duplicate(self):
+        tracking_email_obj = self.env["mail.tracking.email"]
+        self.assertEqual(tracking_email_obj._mailgun_events_process([self.event]), 1)
+        queries = self.cr.sql_log_count
+        self.assertEqual(tracking_email_obj._mailgun_events_process([self.event]), 0)
+        # The already imported events are filtered with a single query
+        self.assertLessEqual(self.cr.sql_log_count - queries, 2)
+        self.assertEqual(len(self.event_search("delivered")), 1)
+
+    @mute_logger("odoo.addons.mail_tracking_mailgun.models.mail_tracking_mailgun_spool")
+    def test_event_spooled_error(self):
+        self.env["ir.config_parameter"].set_param("mailgun.webhook_async", "True")
+        self.event["user-variables"]["odoo_db"] = "%s_nope" % self.env.cr.dbname
+        spool_obj = self.env["mail.tracking.mailgun.spool"]
+        with self._request_mock():
+            self.MailTrackingController.mail_tracking_mailgun_webhook()
+        self.assertEqual(spool_obj._cron_spool_process(), 0)
+        spooled = spool_obj.search([])
+        self.assertEqual(spooled.attempts, 1)
+        self.assertTrue(spooled.error)
+        self.assertEqual(spooled.state, "pending")
+
+    @mute_logger("odoo.addons.mail_tracking_mailgun.models.mail_tracking_mailgun_spool")
+    def test_event_spooled_dead(self):
+        self.env["ir.config_parameter"].set_param("mailgun.webhook_async", "True")
+        self.event["user-variables"]["odoo_db"] = "%s_nope" % self.env.cr.dbname
+        spool_obj = self.env["mail.tracking.mailgun.spool"]
+        with self._request_mock():
+            self.MailTrackingController.mail_tracking_mailgun_webhook()
+        spooled = spool_obj.search([])
+        spooled.write({"attempts": SPOOL_MAX_ATTEMPTS - 1})
+        self.assertEqual(spool_obj._cron_spool_process(), 0)
+        self.assertEqual(spooled.state, "dead")
+        self.assertEqual(spool_obj.spool_metrics(), {"depth": 0, "lag": 0, "dead": 1})
+        # Dead events aren't retried
+        with mock.patch.object(
+            type(self.env["mail.tracking.email"]), "_mailgun_event_process"
+        ) as mock_process:
+            self.assertEqual(spool_obj._cron_spool_process(), 0)
+        mock_process.assert_not_called()
+        # and are deleted after the retention period
+        spool_obj._gc_mail_tracking_mailgun_spool()
+        self.assertTrue(spooled.exists())
+        self.env.cr.execute(
+            "UPDATE mail_tracking_mailgun_spool"
+            " SET write_date = write_date - interval '31 days' WHERE id = %s",
+            (spooled.id,),
+        )
+        spool_obj._gc_mail_tracking_mailgun_spool()
+        self.assertFalse(spooled.exists())
+
+    @mock.patch(_packagepath + ".models.mail_tracking_email.mailgun_session")
+    @mute_logger(_packagepath + ".models.res_partner")
+    def test_email_auto_check_no_validation_key(self, mock_session):
+        self.env["ir.config_parameter"].set_param(
+            "mailgun.auto_check_partner_email", "True"
+        )
+        self.env["ir.config_parameter"].set_param("mailgun.validation_key", "")
+        self.partner.email = "info@tecnativa.com"
+        self.assertFalse(
+            self.env["res.partner"]._cron_mailgun_autocheck_partner_email()
+        )
+        mock_session.assert_not_called()
+        self.assertTrue(self.partner.mailgun_auto_check_pending)
+
+    @mock.patch(_packagepath + ".models.mail_tracking_email.mailgun_session")
+    def test_email_auto_check_failed(self, mock_session):
+        mock_request = mock_session.return_value
+        mock_request.get.return_value.status_code = 503
+        self.env["ir.config_parameter"].set_param(
+            "mailgun.auto_check_partner_email", "True"
+        )
+        self.partner.email = "info@tecnativa.com"
+        self.env["res.partner"]._cron_mailgun_autocheck_partner_email()
+        # Checked again by the next run
+        self.assertTrue(self.partner.mailgun_auto_check_pending)
+        mock_request.get.return_value.status_code = 200
+        mock_request.get.return_value.json.return_value = {
+            "is_valid": True,
+            "mailbox_verification": "true",
+        }
+        self.env["res.partner"]._cron_mailgun_autocheck_partner_email()
+        self.assertFalse(self.partner.mailgun_auto_check_pending)
+
+    @mock.patch(_packagepath + ".models.mail_tracking_email.mailgun_session")
+    def test_email_validity(self, mock_session):
+        mock_request = mock_session.return_value
         self.partner.email_bounced = False
         mock_request.get.return_value.apparent_encoding = "ascii"
         mock_request.get.return_value.status_code = 200
@@ -382,6 +533,9 @@ class TestMailgun(TransactionCase):
             "mailgun.auto_check_partner_email", "True"
         )
         self.partner.email = "info@tecnativa.com"
+        self.assertTrue(self.partner.mailgun_auto_check_pending)
+        self.env["res.partner"]._cron_mailgun_autocheck_partner_email()
+        self.assertFalse(self.partner.mailgun_auto_check_pending)
         self.assertFalse(self.partner.email_bounced)
         self.partner.email = "xoxoxoxo@tecnativa.com"
         # Not a valid mailbox
@@ -407,8 +561,9 @@ class TestMailgun(TransactionCase):
             self.partner.check_email_validity()
         self.assertTrue(self.partner.email_bounced)
 
-    @mock.patch(_packagepath + ".models.res_partner.requests")
-    def test_email_validity_exceptions(self, mock_request):
+    @mock.patch(_packagepath + ".models.mail_tracking_email.mailgun_session")
+    def test_email_validity_exceptions(self, mock_session):
+        mock_request = mock_session.return_value
         mock_request.get.return_value.status_code = 404
         with self.assertRaises(UserError):
             self.partner.check_email_validity()
@@ -416,8 +571,9 @@ class TestMailgun(TransactionCase):
         with self.assertRaises(UserError):
             self.partner.check_email_validity()
 
-    @mock.patch(_packagepath + ".models.res_partner.requests")
-    def test_bounced(self, mock_request):
+    @mock.patch(_packagepath + ".models.mail_tracking_email.mailgun_session")
+    def test_bounced(self, mock_session):
+        mock_request = mock_session.return_value
         self.partner.email_bounced = True
         mock_request.get.return_value.status_code = 404
         self.partner.check_email_bounced()
@@ -430,6 +586,34 @@ class TestMailgun(TransactionCase):
         self.partner.force_unset_bounced()
         self.assertFalse(self.partner.email_bounced)
 
+    @mock.patch(_packagepath + ".models.mail_tracking_email.mailgun_session")
+    def test_bounced_batch(self, mock_session):
+        partners = self.env["res.partner"].create(
+            [
+                {"name": "Mr. Odoo %s" % i, "email": "mrodoo%s@example.com" % i}
+                for i in range(20)
+            ]
+        )
+        mock_session.return_value.get.return_value.status_code = 200
+        partners.check_email_bounced()
+        self.assertEqual(mock_session.return_value.get.call_count, 20)
+        self.assertTrue(all(partners.mapped("email_bounced")))
+        mock_session.return_value.delete.side_effect = requests.ConnectionError
+        partners.force_unset_bounced()
+        self.assertTrue(all(partners.mapped("email_bounced")))
+
+    def test_country_search_cache(self):
+        tracking_email_obj = self.env["mail.tracking.email"]
+        self.assertEqual(
+            tracking_email_obj._country_search("us"), self.env.ref("base.us").id
+        )
+        queries = self.cr.sql_log_count
+        tracking_email_obj._country_search("US")
+        self.assertEqual(self.cr.sql_log_count, queries)
+        self.assertFalse(tracking_email_obj._country_search("ZZ"))
+        country = self.env["res.country"].create({"name": "Test", "code": "ZZ"})
+        self.assertEqual(tracking_email_obj._country_search("zz"), country.id)
+
     def test_email_bounced_set(self):
         message_number = len(self.partner.message_ids) + 1
         self.partner._email_bounced_set("test_error", False)
@@ -438,8 +622,9 @@ class TestMailgun(TransactionCase):
         self.partner._email_bounced_set("test_error", False)
         self.assertEqual(len(self.partner.message_ids), message_number)
 
-    @mock.patch(_packagepath + ".models.mail_tracking_email.requests")
-    def test_manual_check(self, mock_request):
+    @mock.patch(_packagepath + ".models.mail_tracking_email.mailgun_session")
+    def test_manual_check(self, mock_session):
+        mock_request = mock_session.return_value
         mock_request.get.return_value.json.return_value = self.response
         mock_request.get.return_value.status_code = 200
         self.tracking_email.action_manual_check_mailgun()
@@ -449,8 +634,9 @@ class TestMailgun(TransactionCase):
         self.assertTrue(event)
         self.assertEqual(event.event_type, self.response["items"][0]["event"])
 
-    @mock.patch(_packagepath + ".models.mail_tracking_email.requests")
-    def test_manual_check_exceptions(self, mock_request):
+    @mock.patch(_packagepath + ".models.mail_tracking_email.mailgun_session")
+    def test_manual_check_exceptions(self, mock_session):
+        mock_request = mock_session.return_value
         mock_request.get.return_value.status_code = 404
         with self.assertRaises(UserError):
             self.tracking_email.action_manual_check_mailgun()
@@ -0,0 +1,126 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from odoo.tests.common import TransactionCase
+
+
+class MailgunEventsStub(BaseHTTPRequestHandler):
+    """Local stub of the Mailgun Events API serving ``pages`` in order"""
+
+    pages = []
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        page = len(self.requests) - 1
+        status, items = self.pages[page] if page < len(self.pages) else (200, [])
+        body = json.dumps(
+            {
+                "items": items,
+                "paging": {
+                    "next": "http://%s:%s/v3/example.com/events/page-%s"
+                    % (*self.server.server_address, page + 1)
+                },
+            }
+        ).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestMailgunBackfill(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.server = HTTPServer(("127.0.0.1", 0), MailgunEventsStub)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        MailgunEventsStub.requests = []
+        icp = self.env["ir.config_parameter"]
+        icp.set_param("mailgun.apikey", "key-12345678901234567890123456789012")
+        icp.set_param("mailgun.domain", "example.com")
+        icp.set_param("mailgun.api_url", "http://%s:%s/v3" % self.server.server_address)
+        self.tracking_emails = self.env["mail.tracking.email"].create(
+            [
+                {
+                    "name": "Test subject",
+                    "recipient": "to%s@example.com" % i,
+                    "state": "sent",
+                }
+                for i in range(3)
+            ]
+        )
+        self.backfill = self.env["mail.tracking.mailgun.backfill"].create(
+            {
+                "date_begin": datetime.now() - timedelta(hours=2),
+                "date_end": datetime.now(),
+            }
+        )
+
+    def _event(self, event_id, tracking_email, event_type="delivered", db=None):
+        return {
+            "id": event_id,
+            "timestamp": 1471021089.0,
+            "event": event_type,
+            "recipient": tracking_email.recipient,
+            "message": {"headers": {"message-id": "test-id@f187c54734e8"}},
+            "user-variables": {
+                "odoo_db": db or self.env.cr.dbname,
+                "tracking_email_id": tracking_email.id,
+            },
+        }
+
+    def test_backfill(self):
+        MailgunEventsStub.pages = [
+            (
+                200,
+                [
+                    self._event("event-1", self.tracking_emails[0]),
+                    self._event("event-2", self.tracking_emails[1]),
+                    # Events of other databases are skipped
+                    self._event("event-3", self.tracking_emails[2], db="other"),
+                ],
+            ),
+            (200, [self._event("event-4", self.tracking_emails[2], "opened")]),
+        ]
+        self.backfill.action_backfill_run()
+        self.assertEqual(self.backfill.state, "done")
+        self.assertEqual(self.backfill.page_count, 2)
+        self.assertEqual(self.backfill.event_count, 4)
+        self.assertEqual(self.backfill.imported_count, 3)
+        self.assertEqual(
+            self.tracking_emails.mapped("state"), ["delivered", "delivered", "opened"]
+        )
+        self.assertIn("ascending=yes", MailgunEventsStub.requests[0])
+        # Already imported events are skipped
+        MailgunEventsStub.requests = []
+        backfill = self.backfill.copy()
+        backfill.action_backfill_run()
+        self.assertEqual(backfill.event_count, 4)
+        self.assertEqual(backfill.imported_count, 0)
+
+    def test_backfill_resume(self):
+        MailgunEventsStub.pages = [
+            (200, [self._event("event-1", self.tracking_emails[0])]),
+            (500, []),
+            (200, [self._event("event-2", self.tracking_emails[1])]),
+        ]
+        self.backfill.action_backfill_run()
+        self.assertEqual(self.backfill.state, "error")
+        self.assertEqual(self.backfill.page_count, 1)
+        self.assertTrue(self.backfill.next_url.endswith("/page-1"))
+        # The failed page is requested again when resumed
+        self.backfill.action_backfill_resume()
+        self.env["mail.tracking.mailgun.backfill"]._cron_backfill_process()
+        self.assertEqual(self.backfill.state, "done")
+        self.assertEqual(self.backfill.imported_count, 2)
+        self.assertEqual(MailgunEventsStub.requests[2], MailgunEventsStub.requests[1])
@@ -64,8 +64,41 @@ class ResConfigSettings(models.TransientModel):
     mail_tracking_mailgun_auto_check_partner_emails = fields.Boolean(
         string="Check partner emails automatically",
         config_parameter="mailgun.auto_check_partner_email",
-        help="Attempt to check partner emails always. This may cost money.",
+        help="Attempt to check partner emails always. The new or changed "
+        "emails are checked in batches by a scheduled action. This may cost money.",
     )
+    mail_tracking_mailgun_webhook_async = fields.Boolean(
+        string="Process webhooks asynchronously",
+        config_parameter="mailgun.webhook_async",
+        help="Webhook events are only verified and spooled, and a scheduled "
+        "action processes them in batches.",
+    )
+    mail_tracking_mailgun_spool_batch_size = fields.Integer(
+        string="Webhook events batch size",
+        config_parameter="mailgun.spool_batch_size",
+        default=500,
+        help="Number of spooled webhook events processed per transaction.",
+    )
+    mail_tracking_mailgun_spool_depth = fields.Integer(
+        string="Pending webhook events",
+        compute="_compute_mail_tracking_mailgun_spool_metrics",
+    )
+    mail_tracking_mailgun_spool_lag = fields.Integer(
+        string="Webhook events lag (seconds)",
+        compute="_compute_mail_tracking_mailgun_spool_metrics",
+    )
+    mail_tracking_mailgun_spool_dead = fields.Integer(
+        string="Dead webhook events",
+        compute="_compute_mail_tracking_mailgun_spool_metrics",
+        help="Webhook events that failed too many times. They aren't retried "
+        "and are deleted after the retention period.",
+    )
+
+    def _compute_mail_tracking_mailgun_spool_metrics(self):
+        metrics = self.env["mail.tracking.mailgun.spool"].sudo().spool_metrics()
+        self.mail_tracking_mailgun_spool_depth = metrics["depth"]
+        self.mail_tracking_mailgun_spool_lag = metrics["lag"]
+        self.mail_tracking_mailgun_spool_dead = metrics["dead"]
 
     def get_values(self):
         """Is Mailgun enabled?"""
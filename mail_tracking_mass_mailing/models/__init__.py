@@ -7,3 +7,4 @@ from . import mail_tracking_email
 from . import mail_tracking_event
 from . import mailing_trace
 from . import mailing_contact
+from . import mail_tracking_email_summary
@@ -29,24 +29,55 @@ class MailTrackingEmail(models.Model):
             tracking.message_id = tracking.mail_stats_id.message_id
         return res
 
-    @api.model
-    def create(self, vals):
-        tracking = super().create(vals)
-        # Link mail statistics with this tracking
-        if tracking.mail_stats_id:
-            tracking.mail_stats_id.write(self._statistics_link_prepare(tracking))
-        return tracking
+    @api.model_create_multi
+    def create(self, vals_list):
+        trackings = super().create(vals_list)
+        trackings.filtered("mail_stats_id")._statistics_link()
+        return trackings
+
+    def _statistics_link(self):
+        """Link the mail statistics with these trackings. All the statistics
+        are linked with a single query, only the extra values returned by
+        ``_statistics_link_prepare`` overrides are written one by one"""
+        trace_obj = self.env["mailing.trace"]
+        trace_ids, tracking_ids = [], []
+        for tracking in self:
+            vals = dict(self._statistics_link_prepare(tracking))
+            trace_ids.append(tracking.mail_stats_id.id)
+            tracking_ids.append(vals.pop("mail_tracking_id", tracking.id))
+            if vals:
+                tracking.mail_stats_id.write(vals)
+        if not trace_ids:
+            return
+        trace_obj.flush(["mail_tracking_id"])
+        self.env.cr.execute(
+            """
+            UPDATE mailing_trace t
+            SET mail_tracking_id = v.tracking_id,
+                write_uid = %s,
+                write_date = NOW() AT TIME ZONE 'UTC'
+            FROM unnest(%s::int[], %s::int[]) AS v(trace_id, tracking_id)
+            WHERE t.id = v.trace_id
+            """,
+            (self.env.uid, trace_ids, tracking_ids),
+        )
+        trace_obj.browse(trace_ids).invalidate_cache(
+            ["mail_tracking_id", "write_uid", "write_date"]
+        )
 
     def _contacts_email_bounced_set(self, reason, event=None):
-        recipients = []
-        if event and event.recipient_address:
-            recipients.append(event.recipient_address)
+        if event and any(event.mapped("recipient_address")):
+            recipients = event.mapped("recipient_address")
         else:
-            recipients = list(filter(None, self.mapped("recipient_address")))
-        for recipient in recipients:
-            self.env["mailing.contact"].search(
-                [("email", "=ilike", recipient)]
-            ).email_bounced_set(self, reason, event=event)
+            recipients = self.mapped("recipient_address")
+        self.env["mailing.contact"]._search_primary_emails(
+            recipients
+        ).email_bounced_set(self, reason, event=event)
+
+    def _gc_summary_key(self):
+        res = super()._gc_summary_key()
+        res["mass_mailing_id"] = self.mass_mailing_id.id
+        return res
 
     def smtp_error(self, mail_server, smtp_server, exception):
         res = super().smtp_error(mail_server, smtp_server, exception)
@@ -58,3 +89,14 @@ class MailTrackingEmail(models.Model):
         if event_type in {"hard_bounce", "spam", "reject"}:
             self._contacts_email_bounced_set(event_type)
         return res
+
+    @api.model
+    def event_create_batch(self, events):
+        res = super().event_create_batch(events)
+        for event_type in {"hard_bounce", "spam", "reject"}:
+            bounced = res.filtered(lambda x, t=event_type: x.event_type == t)
+            if bounced:
+                bounced.mapped("tracking_email_id")._contacts_email_bounced_set(
+                    event_type
+                )
+        return res
@@ -0,0 +1,14 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import fields, models
+
+
+class MailTrackingEmailSummary(models.Model):
+    _inherit = "mail.tracking.email.summary"
+
+    mass_mailing_id = fields.Many2one(
+        string="Mass mailing",
+        comodel_name="mailing.mailing",
+        readonly=True,
+        ondelete="set null",
+    )
@@ -19,13 +19,36 @@ class MailTrackingEvent(models.Model):
     @api.model
     def process_open(self, tracking_email, metadata):
         res = super().process_open(tracking_email, metadata)
-        mail_mail_stats = self.sudo().env["mailing.trace"]
-        mail_mail_stats.set_opened(mail_mail_ids=[tracking_email.mail_id_int])
+        self._mailing_trace_update("set_opened", tracking_email)
         return res
 
     def _tracking_set_bounce(self, tracking_email, metadata):
+        self._mailing_trace_update("set_bounced", tracking_email)
+
+    @api.model
+    def _mailing_trace_update(self, method, tracking_email):
+        """Update the mailing trace of the tracking email with the given
+        mailing.trace method, or collect it to update the traces at once when
+        processing a batch of events"""
+        batch = self.env.context.get("mail_tracking_event_batch")
+        if batch is not None:
+            batch.setdefault("mailing_trace_" + method, []).append(
+                tracking_email.mail_id_int
+            )
+        else:
+            getattr(self.sudo().env["mailing.trace"], method)(
+                mail_mail_ids=[tracking_email.mail_id_int]
+            )
+
+    @api.model
+    def _process_batch_flush(self, batch):
+        res = super()._process_batch_flush(batch)
         mail_mail_stats = self.sudo().env["mailing.trace"]
-        mail_mail_stats.set_bounced(mail_mail_ids=[tracking_email.mail_id_int])
+        for method in ("set_opened", "set_bounced"):
+            mail_mail_ids = batch.get("mailing_trace_" + method)
+            if mail_mail_ids:
+                getattr(mail_mail_stats, method)(mail_mail_ids=mail_mail_ids)
+        return res
 
     @api.model
     def process_hard_bounce(self, tracking_email, metadata):
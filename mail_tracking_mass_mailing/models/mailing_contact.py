@@ -16,9 +16,10 @@ class MailMassMailingContact(models.Model):
     @api.depends("email")
     def _compute_email_score(self):
         with_email = self.filtered("email")
+        scores = self.env["mail.tracking.email"].email_score_from_emails(
+            with_email.mapped("email")
+        )
         for contact in with_email:
-            contact.email_score = self.env[
-                "mail.tracking.email"
-            ].email_score_from_email(contact.email)
+            contact.email_score = scores[contact.email.lower()]
         remaining = self - with_email
         remaining.email_score = 0.0
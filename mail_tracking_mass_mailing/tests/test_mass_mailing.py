@@ -81,6 +81,42 @@ class TestMassMailing(TransactionCase):
             tracking_email.event_create("open", metadata)
             self.assertTrue(stat.opened)
 
+    def test_tracking_email_link_batch(self):
+        self.env["mailing.contact"].create(
+            [
+                {
+                    "list_ids": [(6, 0, self.list.ids)],
+                    "name": "Test contact %s" % i,
+                    "email": "contact_%s@example.com" % i,
+                }
+                for i in range(3)
+            ]
+        )
+        self.mailing.action_send_mail()
+        stats = self.mailing.mailing_trace_ids
+        self.assertEqual(len(stats), 4)
+        stats.mapped("mail_mail_id").send()
+        for stat in stats:
+            self.assertTrue(stat.mail_tracking_id)
+            self.assertEqual(stat.mail_tracking_id.mail_stats_id, stat)
+
+    def test_tracking_email_link_single_query(self):
+        self.mailing.action_send_mail()
+        stats = self.mailing.mailing_trace_ids
+        with mock.patch.object(type(stats), "write") as mock_write:
+            trackings = self.env["mail.tracking.email"].create(
+                [
+                    {
+                        "name": "Test subject",
+                        "recipient": stat.email,
+                        "mail_stats_id": stat.id,
+                    }
+                    for stat in stats
+                ]
+            )
+        mock_write.assert_not_called()
+        self.assertEqual(stats.mapped("mail_tracking_id"), trackings)
+
     def _tracking_email_bounce(self, event_type, state):
         self.mailing.action_send_mail()
         for stat in self.mailing.mailing_trace_ids:
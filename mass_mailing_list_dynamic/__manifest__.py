@@ -5,7 +5,7 @@
 {
     "name": "Dynamic Mass Mailing Lists",
     "summary": "Mass mailing lists that get autopopulated",
-    "version": "14.0.1.0.0",
+    "version": "14.0.1.1.0",
     "category": "Marketing",
     "website": "https://github.com/OCA/social",
     "author": "Tecnativa, Odoo Community Association (OCA)",
@@ -15,6 +15,7 @@
     "depends": ["mass_mailing_partner"],
     "data": [
         "security/ir.model.access.csv",
+        "data/ir_cron.xml",
         # This should go before "mailing_list_view.xml"
         "wizards/mailing_load_filter_views.xml",
         "views/mailing_list_view.xml",
@@ -2,9 +2,25 @@
 # Copyright 2020 Hibou Corp. - Jared Kipe
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+import logging
+import threading
+import time
+from datetime import timedelta
+
 from odoo import api, fields, models
+from odoo.tools import split_every
 from odoo.tools.safe_eval import safe_eval
 
+_logger = logging.getLogger(__name__)
+
+# Contacts created and subscribed at once when syncing a list
+SYNC_BATCH_SIZE = 1000
+# Partners changed within this delay before the last sync are synced again
+# by the incremental sync, to catch the transactions committed meanwhile
+SYNC_OVERLAP = timedelta(minutes=10)
+# Changing these fields requires a full sync of the list
+SYNC_FIELDS = {"dynamic", "sync_method", "sync_domain"}
+
 
 class MassMailingList(models.Model):
     _inherit = "mailing.list"
@@ -32,40 +48,195 @@ class MassMailingList(models.Model):
     is_synced = fields.Boolean(
         help="Helper field to make the user aware of unsynced changes", default=True
     )
+    sync_auto = fields.Boolean(
+        string="Sync automatically",
+        help="Sync this list periodically, only evaluating the partners "
+        "changed since the last sync",
+    )
+    sync_date = fields.Datetime(
+        string="Last sync", readonly=True, copy=False, help="Sync watermark"
+    )
+
+    def write(self, vals):
+        res = super().write(vals)
+        if SYNC_FIELDS.intersection(vals) and "is_synced" not in vals:
+            # The next automatic sync will be a full one
+            self.filtered("dynamic").write({"is_synced": False})
+        return res
 
     def action_sync(self):
         """Sync contacts in dynamic lists."""
+        for one in self.filtered("dynamic"):
+            one._sync_contacts()
+
+    @api.model
+    def _cron_sync(self):
+        """Sync the automatically synced dynamic lists, only evaluating the
+        partners changed since their last sync when they are synced"""
+        auto_commit = not getattr(threading.currentThread(), "testing", False)
+        for one in self.search([("dynamic", "=", True), ("sync_auto", "=", True)]):
+            # A failing list mustn't prevent the next ones from being synced
+            try:
+                with self.env.cr.savepoint():
+                    one._sync_contacts(incremental=True)
+            except Exception:
+                _logger.exception("Failed to sync dynamic list %s", one.id)
+            if auto_commit:
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    def _sync_partner_query(self, since=False):
+        """SQL query (and its params) of the partners to sync in the list,
+        optionally only the ones changed since the given date"""
+        self.ensure_one()
+        sync_domain = [("email", "!=", False)] + safe_eval(self.sync_domain)
+        if since:
+            sync_domain = [("write_date", ">", since)] + sync_domain
+        return self.env["res.partner"]._search(sync_domain).subselect()
+
+    def _sync_contacts(self, incremental=False):
+        """Sync contacts of this dynamic list computing, in SQL, the contacts
+        to detach and the partners to add. Return the sync statistics.
+
+        An incremental sync of a synced list only evaluates the partners
+        changed since the last sync, and the contacts of deleted partners."""
+        self.ensure_one()
+        start = time.time()
+        sync_date = fields.Datetime.now()
+        since = False
+        if incremental and self.is_synced and self.sync_date:
+            since = self.sync_date - SYNC_OVERLAP
+        self.env["res.partner"].flush(["write_date"])
+        self.env["mailing.contact"].flush(["partner_id", "list_ids"])
+        self.env["mailing.contact.subscription"].flush(["contact_id", "list_id"])
+        partner_query, partner_params = self._sync_partner_query()
+        stats = {"added": 0, "created": 0, "removed": 0}
+        # Detach or remove undesired contacts when synchronization is full
+        if self.sync_method == "full":
+            changed_clause, changed_params = "", []
+            if since:
+                changed_clause = """
+                    AND (
+                        c.partner_id IS NULL
+                        OR c.partner_id IN (
+                            SELECT id FROM res_partner WHERE write_date > %s
+                        )
+                    )
+                """
+                changed_params = [since]
+            self.env.cr.execute(
+                """
+                DELETE FROM mailing_contact_list_rel r
+                USING mailing_contact c
+                WHERE c.id = r.contact_id AND r.list_id = %s
+                    AND (c.partner_id IS NULL OR c.partner_id NOT IN ({}))
+                    {}
+                RETURNING r.contact_id
+                """.format(
+                    partner_query, changed_clause
+                ),
+                [self.id, *partner_params, *changed_params],
+            )
+            detached_ids = [row[0] for row in self.env.cr.fetchall()]
+            stats["removed"] = len(detached_ids)
+            self._sync_orphan_contacts_unlink(detached_ids)
+        # Add new contacts, reusing the first contact of the partner if any
+        if since:
+            partner_query, partner_params = self._sync_partner_query(since)
+        self.env.cr.execute(
+            """
+            SELECT p.id, (
+                SELECT MIN(c.id) FROM mailing_contact c WHERE c.partner_id = p.id
+            )
+            FROM res_partner p
+            WHERE p.id IN ({})
+                AND NOT EXISTS (
+                    SELECT 1 FROM mailing_contact_list_rel r
+                    JOIN mailing_contact c ON c.id = r.contact_id
+                    WHERE r.list_id = %s AND c.partner_id = p.id
+                )
+            ORDER BY p.id
+            """.format(
+                partner_query
+            ),
+            [*partner_params, self.id],
+        )
+        rows = self.env.cr.fetchall()
         Contact = self.env["mailing.contact"].with_context(syncing=True)
-        Partner = self.env["res.partner"]
-        # Skip non-dynamic lists
-        dynamic = self.filtered("dynamic").with_context(syncing=True)
-        for one in dynamic:
-            sync_domain = [("email", "!=", False)] + safe_eval(one.sync_domain)
-            desired_partners = Partner.search(sync_domain)
-            # Detach or remove undesired contacts when synchronization is full
-            if one.sync_method == "full":
-                contact_to_detach = one.contact_ids.filtered(
-                    lambda r: r.partner_id not in desired_partners
+        for sub_rows in split_every(SYNC_BATCH_SIZE, rows):
+            contact_ids = [
+                contact_id for _partner_id, contact_id in sub_rows if contact_id
+            ]
+            new_contacts = Contact.create(
+                [
+                    {"partner_id": partner_id}
+                    for partner_id, contact_id in sub_rows
+                    if not contact_id
+                ]
+            )
+            stats["created"] += len(new_contacts)
+            self._sync_subscriptions_create(contact_ids + new_contacts.ids)
+            stats["added"] += len(sub_rows)
+        self.write({"is_synced": True, "sync_date": sync_date})
+        # Invalidate the cached relations updated in SQL
+        self.env["mailing.contact"].invalidate_cache(
+            ["list_ids", "subscription_list_ids"]
+        )
+        self.env["mailing.contact.subscription"].invalidate_cache()
+        self.invalidate_cache(
+            ["contact_ids", "subscription_contact_ids", "contact_nbr"], self.ids
+        )
+        stats["duration"] = time.time() - start
+        _logger.info(
+            "Mailing list %s %s synced in %.2fs: %s contacts added "
+            "(%s created), %s removed",
+            self.id,
+            "incrementally" if since else "fully",
+            stats["duration"],
+            stats["added"],
+            stats["created"],
+            stats["removed"],
+        )
+        return stats
+
+    def _sync_subscriptions_create(self, contact_ids):
+        """Subscribe the contacts to the list in a single query"""
+        self.ensure_one()
+        if not contact_ids:
+            return
+        self.env.cr.execute(
+            """
+            INSERT INTO mailing_contact_list_rel (
+                contact_id, list_id, opt_out,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT contact_id, %(list_id)s, FALSE,
+                %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+            FROM UNNEST(%(contact_ids)s) contact_id
+            ON CONFLICT DO NOTHING
+            """,
+            {"list_id": self.id, "uid": self.env.uid, "contact_ids": contact_ids},
+        )
+
+    @api.model
+    def _sync_orphan_contacts_unlink(self, contact_ids):
+        """Remove the given contacts that aren't in any list anymore"""
+        if not contact_ids:
+            return
+        self.env.cr.execute(
+            """
+            SELECT c.id FROM mailing_contact c
+            WHERE c.id = ANY(%s)
+                AND NOT EXISTS (
+                    SELECT 1 FROM mailing_contact_list_rel r WHERE r.contact_id = c.id
                 )
-                one.contact_ids -= contact_to_detach
-                contact_to_detach.filtered(lambda r: not r.list_ids).unlink()
-            # Add new contacts
-            current_partners = one.contact_ids.mapped("partner_id")
-            contact_to_list = self.env["mailing.contact"]
-            vals_list = []
-            for partner in desired_partners - current_partners:
-                contacts_in_partner = partner.mass_mailing_contact_ids
-                if contacts_in_partner:
-                    contact_to_list |= contacts_in_partner[0]
-                else:
-                    vals_list.append(
-                        {"list_ids": [(4, one.id)], "partner_id": partner.id}
-                    )
-            one.contact_ids |= contact_to_list
-            Contact.create(vals_list)
-            one.is_synced = True
-        # Invalidate cached contact count
-        self.invalidate_cache(["contact_nbr"], dynamic.ids)
+            """,
+            (list(contact_ids),),
+        )
+        orphan_ids = [row[0] for row in self.env.cr.fetchall()]
+        Contact = self.env["mailing.contact"].with_context(syncing=True)
+        Contact.invalidate_cache(["list_ids", "subscription_list_ids"], orphan_ids)
+        for sub_ids in split_every(SYNC_BATCH_SIZE, orphan_ids):
+            Contact.browse(sub_ids).unlink()
 
     @api.onchange("dynamic", "sync_method", "sync_domain")
     def _onchange_dynamic(self):
@@ -10,3 +10,9 @@ class ResPartner(models.Model):
     def write(self, vals):
         """Allow to write values in mass mailing contact."""
         return super(ResPartner, self.with_context(syncing=True)).write(vals)
+
+    def _mailing_contact_sync_apply(self):
+        """Allow to propagate the queued changes to mass mailing contacts."""
+        return super(
+            ResPartner, self.with_context(syncing=True)
+        )._mailing_contact_sync_apply()
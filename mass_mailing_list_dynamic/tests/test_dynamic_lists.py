@@ -2,10 +2,13 @@
 # Copyright 2020 Hibou Corp. - Jared Kipe
 # Copyright 2021 Tecnativa - Víctor Martínez
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+from datetime import timedelta
+
 from mock import patch
 
 from odoo.exceptions import ValidationError
 from odoo.tests import common
+from odoo.tools import mute_logger
 
 
 class DynamicListCase(common.SavepointCase):
@@ -91,6 +94,70 @@ class DynamicListCase(common.SavepointCase):
         # Contacts can now be changed
         contact1.name = "other"
 
+    def test_sync_stats(self):
+        """Sync reports the added and removed contacts"""
+        # Partner 0 has a contact in another list
+        other_list = self.env["mailing.list"].create({"name": "other list"})
+        contact0 = self.env["mailing.contact"].create(
+            {"list_ids": [(4, other_list.id)], "partner_id": self.partners[0].id}
+        )
+        stats = self.list._sync_contacts()
+        self.assertEqual((stats["added"], stats["created"]), (5, 4))
+        self.assertIn(contact0, self.list.contact_ids)
+        self.assertEqual(self.list.contact_ids.mapped("partner_id"), self.partners)
+        stats = self.list._sync_contacts()
+        self.assertEqual((stats["added"], stats["removed"]), (0, 0))
+        # Detached contacts are removed if they aren't in other lists
+        self.list.sync_method = "full"
+        self.partners[:2].write({"category_id": [(5, False, False)]})
+        contact1 = self.partners[1].mass_mailing_contact_ids
+        stats = self.list._sync_contacts()
+        self.assertEqual((stats["added"], stats["removed"]), (0, 2))
+        self.assertEqual(self.list.contact_nbr, 3)
+        self.assertEqual(contact0.list_ids, other_list)
+        self.assertFalse(contact1.exists())
+
+    def test_cron_sync(self):
+        """Automatic sync is incremental once the list is synced"""
+        list_obj = self.env["mailing.list"]
+        self.list.write({"sync_auto": True, "sync_method": "full"})
+        self.assertFalse(self.list.is_synced)
+        list_obj._cron_sync()
+        self.assertTrue(self.list.is_synced)
+        self.assertTrue(self.list.sync_date)
+        self.assertEqual(self.list.contact_nbr, 5)
+        # Partners changed before the last sync aren't evaluated again
+        self.list.sync_date += timedelta(hours=1)
+        self.partners[0].category_id = False
+        # Contacts of deleted partners are removed
+        self.partners[1].unlink()
+        list_obj._cron_sync()
+        self.list.flush()
+        self.assertEqual(self.list.contact_nbr, 4)
+        # Changing the criteria makes the next sync a full one
+        self.list.sync_domain = self.list.sync_domain
+        self.assertFalse(self.list.is_synced)
+        list_obj._cron_sync()
+        self.list.flush()
+        self.assertEqual(self.list.contact_nbr, 3)
+
+    @mute_logger("odoo.addons.mass_mailing_list_dynamic.models.mailing_list")
+    def test_cron_sync_error(self):
+        """A failing list doesn't prevent the other ones from being synced"""
+        broken = self.list.copy(
+            {
+                "name": "0 broken list",
+                "sync_auto": True,
+                "sync_domain": repr([("nonexistent_field", "=", 1)]),
+            }
+        )
+        self.list.sync_auto = True
+        self.env["mailing.list"]._cron_sync()
+        self.list.flush()
+        self.assertEqual(self.list.contact_nbr, 5)
+        self.assertTrue(self.list.sync_date)
+        self.assertFalse(broken.sync_date)
+
     def test_sync_when_sending_mail(self):
         """Check that list in synced when sending a mass mailing."""
         self.list.action_sync()
@@ -6,6 +6,9 @@
 # Copyright 2020 Hibou Corp.
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+from collections import defaultdict
+from operator import itemgetter
+
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
 
@@ -17,6 +20,11 @@ class MailingContact(models.Model):
         comodel_name="res.partner", string="Partner", domain=[("email", "!=", False)]
     )
 
+    def flush(self, fnames=None, records=None):
+        # Apply the queued partner changes before the contacts are read
+        self.env["res.partner"]._mailing_contact_sync_apply()
+        return super().flush(fnames=fnames, records=records)
+
     @api.constrains("partner_id", "list_ids")
     def _check_partner_id_list_ids(self):
         for contact in self:
@@ -46,31 +54,120 @@ class MailingContact(models.Model):
                 self.tag_ids = category_ids
 
     @api.model
-    def create(self, vals):
-        record = self.new(vals)
-        if not record.partner_id:
-            record._set_partner()
-        record._onchange_partner_mass_mailing_partner()
-        new_vals = record._convert_to_write(record._cache)
-        new_vals.update(
-            subscription_list_ids=vals.get("subscription_list_ids", []),
-            list_ids=vals.get("list_ids", []),
+    def _partner_contact_vals(self, partner):
+        """Contact values taken from its partner, as the partner onchange"""
+        vals = {
+            "name": partner.name,
+            "email": partner.email,
+            "title_id": partner.title.id,
+            "company_name": partner.company_id.name,
+            "country_id": partner.country_id.id,
+        }
+        if partner.category_id:
+            vals["tag_ids"] = [(6, 0, partner.category_id.ids)]
+        return vals
+
+    @api.model
+    def _partners_by_email(self, emails):
+        """Search at once the partners of the given emails. Return the first
+        one of each email, indexed by normalized email."""
+        emails = {email.strip().lower() for email in emails if email}
+        if not emails:
+            return {}
+        partner_obj = self.env["res.partner"]
+        partner_obj.flush(["email"])
+        partners = partner_obj.search(
+            [
+                (
+                    "id",
+                    "inselect",
+                    (
+                        "SELECT id FROM res_partner WHERE lower(email) = ANY(%s)",
+                        [list(emails)],
+                    ),
+                )
+            ]
         )
-        return super().create(new_vals)
+        res = {}
+        for partner in partners:
+            res.setdefault(partner.email.lower(), partner)
+        return res
 
-    def write(self, vals):
-        for contact in self:
-            new_vals = contact.copy_data(vals)[0]
-            record = self.new(new_vals)
-            if not record.partner_id:
-                record._set_partner()
-            record._onchange_partner_mass_mailing_partner()
-            new_vals = record._convert_to_write(record._cache)
-            new_vals.update(
-                subscription_list_ids=vals.get("subscription_list_ids", []),
-                list_ids=vals.get("list_ids", []),
+    @api.model
+    def _partner_sync_vals_list(self, vals_list, contacts):
+        """Complete the values to write in each of the given contacts, or to
+        create when ``contacts`` is empty, with the partner values. Contacts
+        without partner get the one of their email, which is created if one of
+        their lists requires it."""
+        contacts = list(contacts) or [self.browse()] * len(vals_list)
+        partner_ids = [
+            vals["partner_id"] if "partner_id" in vals else contact.partner_id.id
+            for contact, vals in zip(contacts, vals_list)
+        ]
+        emails = [
+            vals["email"] if "email" in vals else contact.email
+            for contact, vals in zip(contacts, vals_list)
+        ]
+        partners_by_email = self._partners_by_email(
+            email for email, partner_id in zip(emails, partner_ids) if not partner_id
+        )
+        partner_vals_by_email = {}
+        for i, (contact, vals) in enumerate(zip(contacts, vals_list)):
+            if partner_ids[i] or not emails[i] or not emails[i].strip():
+                continue
+            email = emails[i].strip().lower()
+            if email in partners_by_email:
+                partner_ids[i] = partners_by_email[email].id
+                continue
+            if email in partner_vals_by_email:
+                continue
+            record = self.new(contact.copy_data(vals)[0] if contact else vals)
+            lts = record.subscription_list_ids.mapped("list_id") | record.list_ids
+            if lts.filtered("partner_mandatory"):
+                partner_vals_by_email[email] = record._prepare_partner()
+        if partner_vals_by_email:
+            new_partners = (
+                self.env["res.partner"]
+                .sudo()
+                .create(list(partner_vals_by_email.values()))
+            )
+            partners_by_email.update(zip(partner_vals_by_email, new_partners))
+            for i, partner_id in enumerate(partner_ids):
+                email = (emails[i] or "").strip().lower()
+                if not partner_id and email in partner_vals_by_email:
+                    partner_ids[i] = partners_by_email[email].id
+        # Iterate the partners to prefetch them all together
+        partners = {
+            partner.id: partner
+            for partner in self.env["res.partner"].browse(
+                set(filter(None, partner_ids))
             )
-            super(MailingContact, contact).write(new_vals)
+        }
+        res = []
+        for vals, partner_id in zip(vals_list, partner_ids):
+            vals = dict(vals)
+            if partner_id:
+                vals["partner_id"] = partner_id
+                vals.update(self._partner_contact_vals(partners[partner_id]))
+            res.append(vals)
+        return res
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        return super().create(self._partner_sync_vals_list(vals_list, self.browse()))
+
+    def write(self, vals):
+        # Group the contacts to write the same values at once
+        contact_ids = defaultdict(list)
+        values = {}
+        for contact, contact_vals in zip(
+            self, self._partner_sync_vals_list([vals] * len(self), self)
+        ):
+            key = repr(sorted(contact_vals.items(), key=itemgetter(0)))
+            contact_ids[key].append(contact.id)
+            values[key] = contact_vals
+        for key, ids in contact_ids.items():
+            super(MailingContact, self.browse(ids)).write(values[key])
         return True
 
     def _get_categories(self):
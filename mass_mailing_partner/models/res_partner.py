@@ -5,9 +5,24 @@
 # Copyright 2020 Tecnativa - Manuel Calero
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+from collections import defaultdict
+from operator import itemgetter
+
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
 
+# Partner fields propagated to their mailing contacts, and the contact fields
+PARTNER_CONTACT_FIELDS = {
+    "name": "name",
+    "email": "email",
+    "title": "title_id",
+    "company_id": "company_name",
+    "country_id": "country_id",
+    "category_id": "tag_ids",
+}
+# Key of the queued propagations in the cursor precommit data
+CONTACT_SYNC_KEY = "mass_mailing_partner.contact_sync"
+
 
 class ResPartner(models.Model):
     _inherit = "res.partner"
@@ -72,23 +87,66 @@ class ResPartner(models.Model):
 
     def write(self, vals):
         res = super().write(vals)
-        mm_vals = {}
-        if vals.get("name"):
-            mm_vals["name"] = vals["name"]
-        if vals.get("email"):
-            mm_vals["email"] = vals["email"]
-        if vals.get("title"):
-            mm_vals["title_id"] = vals["title"]
-        if vals.get("parent_id"):
-            parent = self.browse(vals.get("parent_id"))
-            mm_vals["company_name"] = parent.commercial_company_name
-        if vals.get("country_id"):
-            mm_vals["country_id"] = vals["country_id"]
-        if vals.get("category_id"):
-            mm_vals["tag_ids"] = vals["category_id"]
-        if mm_vals:
-            # Using sudo because ACLs shouldn't produce data inconsistency
-            self.env["mailing.contact"].sudo().search(
-                [("partner_id", "in", self.ids)]
-            ).write(mm_vals)
+        fnames = set(PARTNER_CONTACT_FIELDS).intersection(vals)
+        if fnames:
+            self._mailing_contact_sync_queue(fnames)
         return res
+
+    def _mailing_contact_sync_queue(self, fnames):
+        """Queue the propagation of the given fields to the mailing contacts
+        of these partners. The changes of the transaction are applied at once
+        when mailing contacts are flushed, or before the commit."""
+        data = self.env.cr.precommit.data
+        pending = data.get(CONTACT_SYNC_KEY)
+        if pending is None:
+            pending = data[CONTACT_SYNC_KEY] = {}
+            self.env.cr.precommit.add(self._mailing_contact_sync_precommit)
+        for partner_id in self.ids:
+            pending.setdefault(partner_id, set()).update(fnames)
+        # Read the contacts again once the changes are applied
+        self.env["mailing.contact"].invalidate_cache(
+            [PARTNER_CONTACT_FIELDS[fname] for fname in fnames]
+        )
+
+    def _mailing_contact_vals(self, fnames):
+        """Mailing contact values of the given partner fields"""
+        self.ensure_one()
+        vals = {}
+        if "name" in fnames:
+            vals["name"] = self.name
+        if "email" in fnames:
+            vals["email"] = self.email
+        if "title" in fnames:
+            vals["title_id"] = self.title.id
+        if "company_id" in fnames:
+            vals["company_name"] = self.company_id.name
+        if "country_id" in fnames:
+            vals["country_id"] = self.country_id.id
+        if "category_id" in fnames:
+            vals["tag_ids"] = [(6, 0, self.category_id.ids)]
+        return vals
+
+    @api.model
+    def _mailing_contact_sync_apply(self):
+        """Propagate the queued partner changes to their mailing contacts,
+        writing together the contacts getting the same values"""
+        pending = self.env.cr.precommit.data.pop(CONTACT_SYNC_KEY, None)
+        if not pending:
+            return
+        # Using sudo because ACLs shouldn't produce data inconsistency
+        contact_obj = self.env["mailing.contact"].sudo()
+        contact_ids = defaultdict(list)
+        values = {}
+        for contact in contact_obj.search([("partner_id", "in", list(pending))]):
+            partner = contact.partner_id
+            vals = partner._mailing_contact_vals(pending[partner.id])
+            key = repr(sorted(vals.items(), key=itemgetter(0)))
+            contact_ids[key].append(contact.id)
+            values[key] = vals
+        for key, ids in contact_ids.items():
+            contact_obj.browse(ids).write(values[key])
+
+    @api.model
+    def _mailing_contact_sync_precommit(self):
+        self._mailing_contact_sync_apply()
+        self.env["mailing.contact"].flush()
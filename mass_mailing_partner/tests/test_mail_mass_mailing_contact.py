@@ -88,6 +88,57 @@ class MailMassMailingContactCase(base.BaseCase):
         contact2.write({"partner_id": False})
         self.assertFalse(contact2.partner_id)
 
+    def test_create_write_mass_mailing_contact_batch(self):
+        contacts = self.env["mailing.contact"].create(
+            [
+                # Existing partner, matched by normalized email
+                {
+                    "email": " PARTNER@test.com ",
+                    "list_ids": [(4, self.mailing_list.id)],
+                },
+                # Partner created for the list requiring it
+                {
+                    "email": "batch1@test.com",
+                    "name": "Batch 1",
+                    "list_ids": [(4, self.mailing_list2.id)],
+                },
+                # No partner
+                {"email": "batch2@test.com", "list_ids": [(4, self.mailing_list.id)]},
+            ]
+        )
+        self.assertEqual(contacts[0].partner_id, self.partner)
+        self.check_mailing_contact_partner(contacts[0])
+        self.assertEqual(contacts[1].partner_id.email, "batch1@test.com")
+        self.assertEqual(contacts[1].partner_id.category_id, self.category_3)
+        self.assertFalse(contacts[2].partner_id)
+        self.assertEqual(contacts[2].email, "batch2@test.com")
+        # Values of each partner are written to its contacts
+        contacts.write({"country_id": self.env.ref("base.cu").id})
+        self.assertEqual(contacts[0].country_id, self.country_es)
+        self.assertFalse(contacts[1].country_id)
+        self.assertEqual(contacts[2].country_id, self.env.ref("base.cu"))
+
+    def test_create_mass_mailing_contact_from_record(self):
+        contact = self.create_mailing_contact(
+            {"email": "partner@test.com", "list_ids": [[6, 0, [self.mailing_list.id]]]}
+        )
+        self.assertEqual(contact.partner_id, self.partner)
+        # Creating from a record doesn't take it as the contact to write
+        new_contacts = contact.create(
+            [
+                {"email": "record1@test.com", "list_ids": [(4, self.mailing_list.id)]},
+                {"email": "record2@test.com", "list_ids": [(4, self.mailing_list.id)]},
+            ]
+        )
+        self.assertEqual(
+            new_contacts.mapped("email"), ["record1@test.com", "record2@test.com"]
+        )
+        self.assertFalse(new_contacts.mapped("partner_id"))
+        new_contact = contact.create(
+            {"email": "record3@test.com", "list_ids": [(4, self.mailing_list.id)]}
+        )
+        self.assertFalse(new_contact.partner_id)
+
     def test_onchange_partner(self):
         contact = self.create_mailing_contact(
             {"email": "partner@test.com", "list_ids": [[6, 0, [self.mailing_list.id]]]}
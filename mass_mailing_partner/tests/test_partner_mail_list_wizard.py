@@ -41,3 +41,31 @@ class PartnerMailListWizardCase(base.BaseCase):
         wizard.partner_ids = [partner.id]
         with self.assertRaises(UserError):
             wizard.add_to_mail_list()
+
+    def test_add_to_mail_list_bulk(self):
+        partners = self.env["res.partner"].create(
+            [
+                {"name": "Bulk partner %s" % i, "email": "bulk%s@test.com" % i}
+                for i in range(20)
+            ]
+        )
+        no_email = self.env["res.partner"].create({"name": "No email partner"})
+        wizard = self.env["partner.mail.list.wizard"].create(
+            {
+                "mail_list_id": self.mailing_list.id,
+                "partner_ids": [(6, 0, (partners | no_email | self.partner).ids)],
+            }
+        )
+        res = wizard.add_to_mail_list()
+        self.assertEqual(res["res_id"], wizard.id)
+        self.assertIn(no_email.display_name, wizard.failure_report)
+        self.assertNotIn(self.partner.display_name, wizard.failure_report)
+        self.assertEqual(
+            self.mailing_list.contact_ids.mapped("partner_id"),
+            partners | self.partner,
+        )
+        # Partners already in the list are skipped
+        wizard.partner_ids = partners
+        self.assertFalse(wizard.add_to_mail_list())
+        self.assertFalse(wizard.failure_report)
+        self.assertEqual(len(self.mailing_list.contact_ids), 21)
@@ -59,3 +59,36 @@ class ResPartnerCase(base.BaseCase):
         ).write({"category_id": [(4, self.category_3.id)]})
         self.assertEqual(len(self.partner.category_id.ids), 3)
         self.assertEqual(len(partner2.category_id.ids), 3)
+
+    def test_write_res_partner_deferred(self):
+        companies = self.env["res.company"].create(
+            [{"name": "Company A"}, {"name": "Company B"}]
+        )
+        partners = self.env["res.partner"].create(
+            [
+                {"name": "Partner %s" % i, "email": "partner%s@test.com" % i}
+                for i in range(4)
+            ]
+        )
+        contacts = self.env["mailing.contact"]
+        for partner in partners:
+            contacts |= self.create_mailing_contact(
+                {"partner_id": partner.id, "list_ids": [[6, 0, [self.mailing_list.id]]]}
+            )
+        partners[:2].write({"company_id": companies[0].id})
+        partners[2:].write({"company_id": companies[1].id})
+        for partner in partners:
+            partner.write({"name": partner.name + " changed"})
+        pending = self.env.cr.precommit.data["mass_mailing_partner.contact_sync"]
+        self.assertEqual(set(pending), set(partners.ids))
+        self.assertEqual(pending[partners[0].id], {"company_id", "name"})
+        self.assertEqual(
+            contacts.mapped("name"), [partner.name for partner in partners]
+        )
+        self.assertFalse(
+            self.env.cr.precommit.data.get("mass_mailing_partner.contact_sync")
+        )
+        self.assertEqual(
+            contacts.mapped("company_name"),
+            ["Company A", "Company A", "Company B", "Company B"],
+        )
@@ -4,8 +4,17 @@
 # Copyright 2020 Tecnativa - Manuel Calero
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+import logging
+
+import psycopg2
+
 from odoo import _, fields, models
-from odoo.exceptions import UserError
+from odoo.exceptions import UserError, ValidationError
+
+_logger = logging.getLogger(__name__)
+
+# Errors of a contact creation reported as a failure of its partner
+CONTACT_CREATE_ERRORS = (UserError, ValidationError, psycopg2.Error)
 
 
 class PartnerMailListWizard(models.TransientModel):
@@ -18,27 +27,101 @@ class PartnerMailListWizard(models.TransientModel):
         relation="mail_list_wizard_partner",
         default=lambda self: self.env.context.get("active_ids"),
     )
+    failure_report = fields.Text(readonly=True)
 
-    def add_to_mail_list(self):
+    def _prepare_contact_vals(self, partner):
+        return {
+            "partner_id": partner.id,
+            "list_ids": [(4, self.mail_list_id.id)],
+            "title_id": partner.title.id,
+            "company_name": partner.company_id.name or False,
+            "country_id": partner.country_id.id,
+            "tag_ids": [(6, 0, partner.category_id.ids)],
+        }
+
+    def _create_contacts(self, partners):
+        """Create the contacts of the given partners at once, or one by one
+        if that fails to know which ones fail. Return the failures indexed
+        by partner."""
         contact_obj = self.env["mailing.contact"]
-        partners = self.partner_ids
+        vals_list = [self._prepare_contact_vals(partner) for partner in partners]
+        try:
+            with self.env.cr.savepoint():
+                contact_obj.create(vals_list)
+            return {}
+        except CONTACT_CREATE_ERRORS:
+            if len(partners) == 1:
+                raise
+        failures = {}
+        for partner, vals in zip(partners, vals_list):
+            try:
+                with self.env.cr.savepoint():
+                    contact_obj.create(vals)
+            except CONTACT_CREATE_ERRORS as error:
+                failures[partner] = self._failure_message(partner, error)
+        return failures
 
-        add_list = partners.filtered("mass_mailing_contact_ids")
-        for partner in add_list:
-            self.mail_list_id.contact_ids = [
-                (4, partner.mass_mailing_contact_ids[0].id)
-            ]
+    def _failure_message(self, partner, error):
+        """Message shown to the user for the error adding the partner"""
+        if isinstance(error, UserError):
+            return error.args[0]
+        _logger.warning(
+            "Failed to create the mailing contact of partner %s: %s", partner.id, error
+        )
+        return _("The mailing contact couldn't be created.")
 
+    def _add_to_mail_list(self):
+        """Add the partners to the mailing list, creating their missing
+        contacts. Return the failures indexed by partner."""
+        self.ensure_one()
+        partners = self.partner_ids
+        # Partners already in the list are skipped
+        listed = self.env["mailing.contact"].search(
+            [
+                ("list_ids", "=", self.mail_list_id.id),
+                ("partner_id", "in", partners.ids),
+            ]
+        )
+        partners -= listed.mapped("partner_id")
+        add_list = partners.filtered("mass_mailing_contact_ids")
+        if add_list:
+            self.mail_list_id.write(
+                {
+                    "contact_ids": [
+                        (4, partner.mass_mailing_contact_ids[0].id)
+                        for partner in add_list
+                    ]
+                }
+            )
         to_create = partners - add_list
-        for partner in to_create:
-            if not partner.email:
-                raise UserError(_("Partner '%s' has no email.") % partner.name)
-            contact_vals = {
-                "partner_id": partner.id,
-                "list_ids": [(4, self.mail_list_id.id)],
-                "title_id": partner.title or False,
-                "company_name": partner.company_id.name or False,
-                "country_id": partner.country_id or False,
-                "tag_ids": partner.category_id or False,
-            }
-            contact_obj.create(contact_vals)
+        failures = {
+            partner: _("Partner has no email.")
+            for partner in to_create.filtered(lambda one: not one.email)
+        }
+        to_create -= self.env["res.partner"].concat(*failures)
+        if to_create:
+            try:
+                failures.update(self._create_contacts(to_create))
+            except CONTACT_CREATE_ERRORS as error:
+                failures[to_create] = self._failure_message(to_create, error)
+        return failures
+
+    def add_to_mail_list(self):
+        self.failure_report = False
+        failures = self._add_to_mail_list()
+        if not failures:
+            return
+        report = "\n".join(
+            "{}: {}".format(partner.display_name, error)
+            for partner, error in failures.items()
+        )
+        if len(failures) == len(self.partner_ids):
+            raise UserError(_("No partner could be added:\n%s") % report)
+        self.failure_report = report
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": self._name,
+            "res_id": self.id,
+            "view_mode": "form",
+            "target": "new",
+        }